@@ -0,0 +1,126 @@
+"""
+Local stand-in for an Arweave gateway, a bundler and the GraphQL endpoint, used by the benchmarks.
+
+It accepts every upload without storing it, answers GraphQL lookups with no results so every file
+is uploaded, and serves synthetic files and JPEG images for the spiders to download. Every request
+waits `latency` seconds, and a share `error_rate` of the uploads and lookups fails with 503.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ar.utils import b64enc
+
+EMPTY_GRAPHQL = {'data': {'transactions': {'pageInfo': {'hasNextPage': False}, 'edges': []}}}
+SIGNATURE_SIZE = 512
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.startswith('/files/'):
+            return self._file()
+        if path.startswith('/images/'):
+            return self._image()
+        self._delay()
+        if path == '/tx_anchor':
+            return self._send(200, b64enc(hashlib.sha384(str(time.time()).encode()).digest()).encode())
+        if path.startswith('/price/'):
+            return self._send(200, b'1000')
+        if path.startswith('/wallet/'):
+            return self._send(200, b'1000000000000')
+        self._send(404, b'Not Found')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._delay()
+        if random.random() < self.server.error_rate:
+            return self._send(503, b'Service Unavailable')
+        if self.path == '/tx/arweave':
+            # The id of an ANS-104 DataItem is the SHA-256 of its signature, which follows the 2 byte type.
+            data_id = b64enc(hashlib.sha256(body[2 : 2 + SIGNATURE_SIZE]).digest())
+            return self._send_json({'id': data_id})
+        if self.path == '/graphql':
+            return self._send_json(EMPTY_GRAPHQL)
+        if self.path in ('/tx', '/chunk'):
+            return self._send(200, b'OK')
+        self._send(404, b'Not Found')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _file(self):
+        size = int(re.search(r'size=(\d+)', self.path).group(1))
+        seed = self.path.encode()
+        block = hashlib.sha512(seed).digest() * 16
+        data = (block * (size // len(block) + 1))[:size]
+        self._send(200, data, 'application/octet-stream')
+
+    def _image(self):
+        self._send(200, self.server.image, 'image/jpeg')
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode(), 'application/json')
+
+    def _send(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0):
+        super().__init__(('127.0.0.1', port), FakeGatewayHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.image = _make_image()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_port
+
+
+def _make_image(width=1024, height=768):
+    try:
+        from PIL import Image
+    except ImportError:
+        return b''
+    image = Image.effect_noise((width, height), 64).convert('RGB')
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=1984)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of uploads and lookups failing with 503')
+    args = parser.parse_args()
+
+    server = FakeGateway(args.port, args.latency, args.error_rate)
+    print('Fake gateway listening on %s' % server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+ARWEAVE_METRICS_HOOK target of the benchmark crawls, keeping every timing so percentiles can be reported.
+"""
+
+from collections import defaultdict
+
+timings = defaultdict(list)
+
+
+def record(kind, name, value):
+    if kind == 'timing':
+        timings[name].append(value)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def summary():
+    return {
+        stage: {
+            'count': len(values),
+            'p50': percentile(values, 0.50),
+            'p99': percentile(values, 0.99),
+        }
+        for stage, values in sorted(timings.items())
+    }
@@ -0,0 +1,229 @@
+"""
+Offline benchmarks of the Files and Images pipelines and the feed storage against a local fake gateway and bundler.
+
+    python -m benchmarks.run [small huge images feed] [--latency 0.05] [--error-rate 0.01] [--json]
+
+Each workload crawls in its own process and reports throughput, p50/p99 latency of every upload stage and the peak
+RSS of the crawler process.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import scrapy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (description, default count, default size in bytes)
+WORKLOADS = {
+    'small': ('many small files through the FilesPipeline and the bundler', 1000, 4 * 1024),
+    'huge': ('few large files through the FilesPipeline as chunked L1 transactions', 4, 32 * 1024 * 1024),
+    'images': ('JPEG images with two thumbnails each through the ImagesPipeline', 200, 0),
+    'feed': ('one large jsonlines feed through ArweaveFeedStorage', 100000, 256),
+}
+
+
+class MediaSpider(scrapy.Spider):
+    name = 'benchmark-media'
+
+    def __init__(self, urls, field, **kwargs):
+        super().__init__(**kwargs)
+        self.urls = urls
+        self.field = field
+
+    def start_requests(self):
+        yield scrapy.Request('data:,start')
+
+    def parse(self, response):
+        for url in self.urls:
+            yield {self.field: [url]}
+
+
+class FeedSpider(scrapy.Spider):
+    name = 'benchmark-feed'
+
+    def __init__(self, count, size, **kwargs):
+        super().__init__(**kwargs)
+        self.count = count
+        self.size = size
+
+    def start_requests(self):
+        yield scrapy.Request('data:,start')
+
+    def parse(self, response):
+        for i in range(self.count):
+            yield {'id': i, 'text': 'x' * self.size}
+
+
+def workload_settings(args):
+    """Return the spider class, its arguments and the project settings of the workload."""
+    from scrapy_arweave.feedexport import get_feed_storages
+
+    store = 'ar://' + os.path.join(args.dir, args.worker)
+    settings = {
+        'WALLET_JWK': args.wallet,
+        'GATEWAY_URL': args.gateway,
+        'ARWEAVE_BUNDLER_URL': args.gateway,
+        'ARWEAVE_METRICS_HOOK': 'benchmarks.recorder.record',
+        'ARWEAVE_UPLOAD_RETRY_DELAY': 0.1,
+        'CONCURRENT_REQUESTS': 32,
+        'ROBOTSTXT_OBEY': False,
+        'TELNETCONSOLE_ENABLED': False,
+        'LOG_LEVEL': 'WARNING',
+        'REQUEST_FINGERPRINTER_IMPLEMENTATION': '2.7',
+    }
+    if args.worker in ('small', 'huge'):
+        urls = ['%s/files/%d?size=%d' % (args.gateway, i, args.size) for i in range(args.count)]
+        settings.update({'ITEM_PIPELINES': {'scrapy_arweave.pipelines.FilesPipeline': 1}, 'FILES_STORE': store})
+        if args.worker == 'huge':
+            settings['DOWNLOAD_MAXSIZE'] = 0
+            settings['DOWNLOAD_WARNSIZE'] = 0
+        return MediaSpider, {'urls': urls, 'field': 'file_urls'}, settings
+    if args.worker == 'images':
+        urls = ['%s/images/%d.jpg' % (args.gateway, i) for i in range(args.count)]
+        settings.update(
+            {
+                'ITEM_PIPELINES': {'scrapy_arweave.pipelines.ImagesPipeline': 1},
+                'IMAGES_STORE': store,
+                'IMAGES_THUMBS': {'small': (50, 50), 'big': (270, 270)},
+            }
+        )
+        return MediaSpider, {'urls': urls, 'field': 'image_urls'}, settings
+    settings.update({'FEED_STORAGES': get_feed_storages(), 'FEEDS': {'ar://benchmark.jsonl': {'format': 'jsonlines'}}})
+    return FeedSpider, {'count': args.count, 'size': args.size}, settings
+
+
+def run_worker(args):
+    """Crawl one workload in this process and print its results as JSON."""
+    from scrapy.crawler import CrawlerProcess
+
+    from . import recorder
+
+    spider, spider_args, settings = workload_settings(args)
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spider)
+    process.crawl(crawler, **spider_args)
+    start = time.perf_counter()
+    process.start()
+    seconds = time.perf_counter() - start
+
+    stats = crawler.stats.get_stats()
+    uploaded = stats.get('arweave/bundler/bytes', 0) + stats.get('arweave/l1/bytes', 0)
+    result = {
+        'workload': args.worker,
+        'items': stats.get('item_scraped_count', 0),
+        'bytes': uploaded,
+        'seconds': seconds,
+        'items_per_second': stats.get('item_scraped_count', 0) / seconds,
+        'mb_per_second': uploaded / seconds / 1024 / 1024,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+        'retries': stats.get('arweave/upload/retries', 0),
+        'failed': stats.get('arweave/upload/failed', 0),
+        'latency': recorder.summary(),
+    }
+    print(json.dumps(result))
+
+
+def start_gateway(args):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, '-m', 'benchmarks.fake_gateway', '--port', str(port)]
+    command += ['--latency', str(args.latency), '--error-rate', str(args.error_rate)]
+    gateway = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    gateway.stdout.readline()
+    return gateway, 'http://127.0.0.1:%d' % port
+
+
+def run_workload(name, args, gateway_url, wallet, directory):
+    count, size = WORKLOADS[name][1:]
+    command = [sys.executable, '-m', 'benchmarks.run', '--worker', name, '--gateway', gateway_url]
+    command += ['--wallet', wallet, '--dir', directory]
+    command += ['--count', str(args.count or count), '--size', str(args.size or size)]
+    output = subprocess.run(command, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_results(results):
+    print(
+        '%-8s %8s %10s %8s %10s %8s %9s %8s %7s'
+        % ('workload', 'items', 'MB', 'seconds', 'items/s', 'MB/s', 'RSS MB', 'retries', 'failed')
+    )
+    for result in results:
+        print(
+            '%-8s %8d %10.1f %8.2f %10.1f %8.2f %9.1f %8d %7d'
+            % (
+                result['workload'],
+                result['items'],
+                result['bytes'] / 1024 / 1024,
+                result['seconds'],
+                result['items_per_second'],
+                result['mb_per_second'],
+                result['peak_rss_mb'],
+                result['retries'],
+                result['failed'],
+            )
+        )
+    print()
+    print('%-8s %-16s %8s %10s %10s' % ('workload', 'stage', 'count', 'p50 ms', 'p99 ms'))
+    for result in results:
+        for stage, latency in result['latency'].items():
+            print(
+                '%-8s %-16s %8d %10.2f %10.2f'
+                % (result['workload'], stage, latency['count'], latency['p50'] * 1000, latency['p99'] * 1000)
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('workloads', nargs='*', help='any of %s, default: all' % ', '.join(WORKLOADS))
+    parser.add_argument('--count', type=int, help='files, images or feed items of every workload')
+    parser.add_argument('--size', type=int, help='bytes of every file or feed item')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the fake gateway adds to every request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of uploads failing with 503')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--gateway', help=argparse.SUPPRESS)
+    parser.add_argument('--wallet', help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error('unknown workloads: %s' % ', '.join(sorted(unknown)))
+
+    from ar import Wallet
+
+    directory = tempfile.mkdtemp(prefix='scrapy-arweave-benchmarks-')
+    wallet = os.path.join(directory, 'wallet.json')
+    Wallet.generate(jwk_file=wallet)
+    gateway, gateway_url = start_gateway(args)
+    try:
+        results = [
+            run_workload(name, args, gateway_url, wallet, directory) for name in args.workloads or list(WORKLOADS)
+        ]
+    finally:
+        gateway.terminate()
+        gateway.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
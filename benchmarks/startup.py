@@ -0,0 +1,111 @@
+"""
+Import-time and startup-time benchmark of scrapy_arweave.
+
+    python -m benchmarks.startup [--repeat 10] [--json]
+
+Every sample runs in a fresh process and times importing Scrapy, importing the pipelines and the feed storage,
+building a FilesPipeline and opening an ArweaveFeedStorage, then the first signed DataItem, which now carries
+the cost of loading pyarweave and parsing the wallet key.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ('import scrapy', 'import scrapy_arweave', 'files pipeline', 'feed storage', 'first signature')
+
+
+def run_worker(args):
+    """Time the startup stages in this process and print them as JSON."""
+    timings = {}
+
+    def timed(stage, func):
+        start = time.perf_counter()
+        result = func()
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    def import_scrapy():
+        import scrapy  # noqa: F401
+        from scrapy.settings import Settings
+
+        return Settings
+
+    def import_scrapy_arweave():
+        from scrapy_arweave import feedexport, pipelines
+
+        return pipelines, feedexport
+
+    Settings = timed('import scrapy', import_scrapy)
+    pipelines, feedexport = timed('import scrapy_arweave', import_scrapy_arweave)
+    settings = Settings(
+        {
+            'WALLET_JWK': args.wallet,
+            'GATEWAY_URL': 'http://127.0.0.1:9',
+            'FILES_STORE': os.path.join(args.dir, 'files'),
+        }
+    )
+    pipeline = timed('files pipeline', lambda: pipelines.FilesPipeline.from_settings(settings))
+    storage = feedexport.ArweaveFeedStorage('ar://items.jsonl', settings=settings)
+    spider = SimpleNamespace(crawler=SimpleNamespace(settings=settings))
+    timed('feed storage', lambda: storage.open(spider))
+    client = pipeline.store.client
+    timed('first signature', lambda: client.create_dataitem('file.txt', b'content'))
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help='number of fresh processes to time')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--wallet', help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    from ar import Wallet
+
+    directory = tempfile.mkdtemp(prefix='scrapy-arweave-startup-')
+    wallet = os.path.join(directory, 'wallet.json')
+    Wallet.generate(jwk_file=wallet)
+    command = [sys.executable, '-m', 'benchmarks.startup', '--worker', '--wallet', wallet, '--dir', directory]
+    samples = []
+    try:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            output = subprocess.run(command, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            sample['process'] = time.perf_counter() - start
+            samples.append(sample)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results = {
+        stage: {
+            'median': statistics.median(sample[stage] for sample in samples),
+            'max': max(sample[stage] for sample in samples),
+        }
+        for stage in STAGES + ('process',)
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print('%-22s %10s %10s' % ('stage', 'median ms', 'max ms'))
+    for stage, result in results.items():
+        print('%-22s %10.1f %10.1f' % (stage, result['median'] * 1000, result['max'] * 1000))
+
+
+if __name__ == '__main__':
+    main()
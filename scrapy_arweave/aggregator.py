@@ -0,0 +1,85 @@
+from twisted.internet import defer
+
+
+class BundleAggregator:
+    """
+    Buffers signed DataItems of small files and sends them as a single ANS-104 bundle once
+    max_items DataItems or max_bytes bytes are waiting, or max_delay seconds after the first one arrived.
+    Every file still gets back the id of its own DataItem.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_items=100,
+        max_bytes=5 * 1024 * 1024,
+        max_delay=5.0,
+        max_item_size=256 * 1024,
+        scheduler=None,
+    ):
+        self.client = client
+        self.scheduler = scheduler
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_item_size = max_item_size
+        self._entries = []
+        self._waiters = []
+        self._size = 0
+        self._delayed_flush = None
+
+    @classmethod
+    def from_settings(cls, client, settings, scheduler=None):
+        if not settings.getbool('ARWEAVE_BUNDLE_ENABLED', False):
+            return None
+        return cls(
+            client,
+            max_items=settings.getint('ARWEAVE_BUNDLE_MAX_ITEMS', 100),
+            max_bytes=settings.getint('ARWEAVE_BUNDLE_MAX_BYTES', 5 * 1024 * 1024),
+            max_delay=settings.getfloat('ARWEAVE_BUNDLE_MAX_DELAY', 5.0),
+            max_item_size=settings.getint('ARWEAVE_BUNDLE_ITEM_MAX_SIZE', 256 * 1024),
+            scheduler=scheduler,
+        )
+
+    def accepts(self, size):
+        return size <= self.max_item_size
+
+    def add(self, dataitem, hash=None):
+        """Queue a signed DataItem, returns a Deferred that fires with its id once its bundle is sent."""
+        from twisted.internet import reactor
+
+        dfd = defer.Deferred()
+        self._entries.append((dataitem, hash))
+        self._waiters.append(dfd)
+        self._size += dataitem.get_len_bytes()
+        if len(self._entries) >= self.max_items or self._size >= self.max_bytes:
+            self.flush()
+        elif self._delayed_flush is None:
+            self._delayed_flush = reactor.callLater(self.max_delay, self.flush)
+        return dfd
+
+    def flush(self):
+        if self._delayed_flush is not None and self._delayed_flush.active():
+            self._delayed_flush.cancel()
+        self._delayed_flush = None
+
+        entries, waiters, size = self._entries, self._waiters, self._size
+        self._entries, self._waiters, self._size = [], [], 0
+        if not entries:
+            return defer.succeed(None)
+        if self.scheduler is not None:
+            endpoint = self.client.router.choose(size)
+            dfd = self.scheduler.submit(endpoint, self.client.deferred_upload_bundle, entries)
+        else:
+            dfd = self.client.deferred_upload_bundle(entries)
+        dfd.addCallbacks(self._resolve, self._fail, callbackArgs=(entries, waiters), errbackArgs=(waiters,))
+        return dfd
+
+    def _resolve(self, bundle_id, entries, waiters):
+        for (dataitem, _), dfd in zip(entries, waiters):
+            dfd.callback(dataitem.header.id)
+        return bundle_id
+
+    def _fail(self, failure, waiters):
+        for dfd in waiters:
+            dfd.errback(failure)
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .sessions import session_from_settings
+
+logger = logging.getLogger(__name__)
+
+# Kept in the confirmed set of an upload once the transaction header is accepted.
+HEADER = -1
+
+_global_semaphores = {}
+_global_semaphores_lock = threading.Lock()
+
+
+def _get_global_semaphore(size):
+    # Shared by every uploader in the process so the total number of chunk requests stays bounded.
+    with _global_semaphores_lock:
+        if size not in _global_semaphores:
+            _global_semaphores[size] = threading.BoundedSemaphore(size)
+        return _global_semaphores[size]
+
+
+class ChunkUploader:
+    """
+    Uploads the chunks of a signed L1 transaction with several requests in flight.
+    Chunks that fail are retried with backoff, chunks already confirmed are never sent again.
+    They are sent to peer, or through the gateway pool when gateways is set.
+    """
+
+    def __init__(self, peer, concurrency=4, max_concurrency=32, max_retries=5, gateways=None):
+        self._peer = peer
+        self.gateways = gateways
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.semaphore = _get_global_semaphore(max_concurrency)
+
+    @classmethod
+    def from_settings(cls, settings, gateway_url, gateways=None):
+        peer = None
+        if gateways is None:
+            from ar.peer import Peer
+
+            peer = Peer(gateway_url)
+            peer.session = session_from_settings(settings)
+        return cls(
+            peer,
+            concurrency=settings.getint('ARWEAVE_CHUNK_CONCURRENCY', 4),
+            max_concurrency=settings.getint('ARWEAVE_CHUNK_MAX_CONCURRENCY', 32),
+            max_retries=settings.getint('ARWEAVE_CHUNK_MAX_RETRIES', 5),
+            gateways=gateways,
+        )
+
+    def upload(self, tx, file_handler, confirmed=None):
+        """
+        Post the transaction header, then every chunk that is not in confirmed.
+        confirmed is a set of chunk indexes, and HEADER, that is updated as they are accepted, so a failed
+        upload can be resumed by calling upload again with the same set.
+        """
+        if confirmed is None:
+            confirmed = set()
+        if HEADER not in confirmed:
+            tx.data = b''
+            self._send(lambda peer: peer.send_tx(tx.to_dict()))
+            confirmed.add(HEADER)
+
+        read_lock = threading.Lock()
+        pending = [index for index in range(len(tx.chunks['chunks'])) if index not in confirmed]
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = 2 ** (attempt - 1)
+                logger.info('Retrying %d chunks of %s in %ds', len(pending), tx.id, delay)
+                time.sleep(delay)
+            with ThreadPoolExecutor(self.concurrency) as executor:
+                results = list(executor.map(lambda index: self._upload_chunk(tx, index, read_lock), pending))
+            confirmed.update(index for index, error in zip(pending, results) if error is None)
+            errors = [error for error in results if error is not None]
+            pending = [index for index, error in zip(pending, results) if error is not None]
+            if not pending:
+                return tx.id
+        raise errors[0]
+
+    def _upload_chunk(self, tx, index, read_lock):
+        with read_lock:
+            chunk = tx.get_chunk(index)
+        try:
+            with self.semaphore:
+                self._send(lambda peer: peer.send_chunk(chunk))
+        except Exception as exc:
+            logger.debug('Chunk %d of %s failed: %s', index, tx.id, exc)
+            return exc
+
+    @property
+    def peer(self):
+        if self._peer is None:
+            return self.gateways.gateways[0].peer
+        return self._peer
+
+    def _send(self, func):
+        # With a gateway pool the header and chunks go to the fastest healthy gateway and fail over to the others.
+        if self.gateways is None:
+            return func(self.peer)
+        return self.gateways.call(func)
@@ -1,24 +1,190 @@
+import functools
 import hashlib
+import json
+import logging
 import mimetypes
 import os
+import threading
 from urllib.parse import urljoin
 
-import requests
-from ar import ANS104DataItemHeader, DataItem, Wallet
-from ar.peer import HTTPClient, Peer
-from ar.transaction import Transaction
-from ar.utils.transaction_uploader import create_tag, get_uploader
-from bundlr import Node
+from twisted.internet import defer, threads
 
+from .chunks import ChunkUploader
+from .compression import Compressor
+from .gateways import GatewayPool
+from .index import HashIndex
+from .journal import CONFIRMED, PENDING, SIGNED, SUBMITTED, UploadJournal
+from .metrics import Metrics
+from .routing import BUNDLER, UploadRouter
+from .sessions import get_session, session_from_settings
+from .signing import SigningPool, sign_dataitem
+from .streaming import BufferReader, DataItemReader, serialize_bundle, sign_dataitem_header
+from .twisted_client import TwistedHTTPClient
+from .wallets import ROUND_ROBIN, WalletPool
 
-class ArweaveStorageClient:
-    wallet = None
+# pyarweave, bundlr and the wallet keys are loaded on first use rather than when the spider starts,
+# see ArweaveStorageClient.node and WalletShard.wallet. Same value as bundlr.node.DEFAULT_API_URL.
+DEFAULT_BUNDLER_URL = 'https://node2.bundlr.network'
+
+WARM_UP_QUERY = '''query {
+    transactions(
+        first: 100,
+        owners: ["%s"]%s
+    ) {
+        pageInfo {
+            hasNextPage
+        }
+        edges {
+            cursor
+            node {
+                id
+                tags {
+                    name
+                    value
+                }
+            }
+        }
+    }
+}'''
+
+HASH_LOOKUP_QUERY = '''query {
+    transactions(
+        first: 100,
+        tags: [{ name: "File-Hash", values: [%s]}]%s
+    ) {
+        pageInfo {
+            hasNextPage
+        }
+        edges {
+            cursor
+            node {
+                id
+                tags {
+                    name
+                    value
+                }
+            }
+        }
+    }
+}'''
+
+CONFIRM_QUERY = '''query {
+    transactions(
+        first: 100,
+        ids: [%s]
+    ) {
+        edges {
+            node {
+                id
+            }
+        }
+    }
+}'''
 
-    def __init__(self, wallet_jwk, gateway_url) -> None:
+logger = logging.getLogger(__name__)
+
+
+class ArweaveStorageClient:
+    def __init__(
+        self,
+        wallet_jwk,
+        gateway_url,
+        index=None,
+        http=None,
+        signing_pool_size=0,
+        router=None,
+        chunk_uploader=None,
+        session=None,
+        journal=None,
+        metrics=None,
+        bundler_url=DEFAULT_BUNDLER_URL,
+        gateways=None,
+        compressor=None,
+        wallet_strategy=ROUND_ROBIN,
+        timeout=60,
+        wallet_max_concurrency=0,
+    ) -> None:
         self.GATEWAY_URL = gateway_url
-        self.load_wallet(wallet_jwk)
-        self.node = Node()
-        self.peer = Peer()
+        self.timeout = timeout
+        self.metrics = metrics or Metrics()
+        self.session = session or get_session()
+        self.load_wallet(wallet_jwk, wallet_strategy, wallet_max_concurrency)
+        self.bundler_url = bundler_url
+        self._node = None
+        self.gateways = gateways or GatewayPool([gateway_url])
+        self.gateways.metrics = self.metrics
+        for gateway in self.gateways:
+            gateway.session = self.session
+        self.index = index
+        self.journal = journal
+        self.http = http
+        self.signing_pool = (
+            SigningPool([shard.jwk_data for shard in self.wallets], signing_pool_size) if signing_pool_size else None
+        )
+        self.router = router or UploadRouter()
+        self.compressor = compressor
+        self.chunk_uploader = chunk_uploader or ChunkUploader(None, gateways=self.gateways)
+        # File hash -> (transaction, confirmed chunk indexes) of L1 uploads that failed after signing.
+        self._interrupted = {}
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        kwargs.setdefault('wallet_jwk', settings.get('WALLET_JWK'))
+        kwargs.setdefault('gateway_url', settings.get('GATEWAY_URL') or 'https://arweave.net')
+        kwargs.setdefault('index', HashIndex.from_settings(settings))
+        kwargs.setdefault('http', TwistedHTTPClient.from_settings(settings))
+        kwargs.setdefault('signing_pool_size', settings.getint('ARWEAVE_SIGNING_POOL_SIZE', 0))
+        kwargs.setdefault('router', UploadRouter.from_settings(settings))
+        kwargs.setdefault('gateways', GatewayPool.from_settings(settings, kwargs['gateway_url']))
+        kwargs.setdefault(
+            'chunk_uploader', ChunkUploader.from_settings(settings, kwargs['gateway_url'], gateways=kwargs['gateways'])
+        )
+        kwargs.setdefault('session', session_from_settings(settings))
+        kwargs.setdefault('journal', UploadJournal.from_settings(settings))
+        kwargs.setdefault('metrics', Metrics.from_settings(settings))
+        kwargs.setdefault('compressor', Compressor.from_settings(settings))
+        kwargs.setdefault('bundler_url', settings.get('ARWEAVE_BUNDLER_URL') or DEFAULT_BUNDLER_URL)
+        kwargs.setdefault('wallet_strategy', settings.get('ARWEAVE_WALLET_STRATEGY') or ROUND_ROBIN)
+        kwargs.setdefault('timeout', settings.getfloat('ARWEAVE_HTTP_TIMEOUT', 60))
+        kwargs.setdefault('wallet_max_concurrency', settings.getint('ARWEAVE_WALLET_MAX_CONCURRENCY', 0))
+        return cls(**kwargs)
+
+    @property
+    def wallet(self):
+        return self.wallets.primary.wallet
+
+    @property
+    def node(self):
+        if self._node is None:
+            from bundlr import Node
+
+            self._node = self._share_session(Node(self.bundler_url))
+        return self._node
+
+    @property
+    def peer(self):
+        return self.gateways.gateways[0].peer
+
+    @property
+    def stats(self):
+        return self.metrics.stats
+
+    @stats.setter
+    def stats(self, stats):
+        self.metrics.stats = stats
+
+    def _share_session(self, http_client):
+        http_client.session = self.session
+        return http_client
+
+    def close(self):
+        if self.signing_pool is not None:
+            self.signing_pool.close()
+        if self.journal is not None:
+            self.journal.close()
+        self.gateways.close()
+        if self.http is not None:
+            return self.http.close()
 
     def calculate_hash(self, filepath, algorithm='sha256', chunk_size=65536):
         """
@@ -29,73 +195,394 @@ class ArweaveStorageClient:
         hash_object = hashlib.new(algorithm)
 
         # Read the file in chunks and update the hash object
-        with open(filepath, 'rb') as f:
+        with self.metrics.timed('hash'), open(filepath, 'rb') as f:
             while True:
                 data = f.read(chunk_size)
                 if not data:
                     break
                 hash_object.update(data)
+                self.metrics.add_bytes('hash', len(data))
 
         # Get the hexadecimal representation of the hash value
         hash_value = hash_object.hexdigest()
 
         return hash_value
 
-    def load_wallet(self, wallet_jwk):
+    def load_wallet(self, wallet_jwk, strategy=ROUND_ROBIN, max_concurrency=0):
+        """
+        Load the wallet, or with a list of wallets shard uploads across them; self.wallet is the first one.
+        """
+        jwks = []
         try:
-            if os.path.isfile(wallet_jwk):
-                self.wallet = Wallet(wallet_jwk)
-            else:
-                self.wallet = Wallet.from_data(wallet_jwk)
-            self.wallet.api_url = self.GATEWAY_URL
+            for jwk in wallet_jwk if isinstance(wallet_jwk, (list, tuple)) else [wallet_jwk]:
+                if isinstance(jwk, str) and os.path.isfile(jwk):
+                    with open(jwk) as f:
+                        jwk = json.load(f)
+                jwks.append(dict(jwk))
+            # Only the address is read here, the RSA key is parsed when the wallet first signs.
+            self.wallets = WalletPool(jwks, strategy, load=self._load_wallet, max_concurrency=max_concurrency)
         except:
             raise Exception("Error loading wallet jwk")
+        if not jwks:
+            raise Exception("Error loading wallet jwk")
+        self.wallets.metrics = self.metrics
 
-    def _get_mime_type(self, file_path):
-        mimetype, _ = mimetypes.guess_type(file_path)
-        if mimetype is None:
-            try:
-                import magic
+    def _load_wallet(self, jwk_data):
+        from ar import Wallet
+
+        wallet = Wallet.from_data(jwk_data)
+        wallet.api_url = self.GATEWAY_URL
+        self._share_session(wallet.peer)
+        return wallet
+
+    def calculate_buffer_hash(self, file_buffer, algorithm='sha256'):
+        """
+        Calculate the hash of in-memory file contents using the specified algorithm.
+        Returns the same value as calculate_hash for the same contents.
+        """
+        with self.metrics.timed('hash'):
+            hash_value = hashlib.new(algorithm, file_buffer).hexdigest()
+        self.metrics.add_bytes('hash', len(file_buffer))
+        return hash_value
 
-                mimetype = magic.from_file(file_path, mime=True)
-            except ImportError:
-                pass
+    def _get_mime_type(self, file_path, file_buffer=None):
+        mimetype, _ = mimetypes.guess_type(file_path)
+        magic = _get_magic() if mimetype is None else None
+        if magic is not None:
+            with self.metrics.timed('mime'):
+                if file_buffer is not None:
+                    mimetype = magic.from_buffer(bytes(file_buffer[:2048]), mime=True)
+                else:
+                    mimetype = magic.from_file(file_path, mime=True)
         return mimetype
 
-    def upload(self, file_path, file_buffer, hash=None):
-        mime_type = self._get_mime_type(file_path)
+    def _get_tags(self, mime_type, hash=None, encoding=None):
+        tags = []
+        if mime_type:
+            tags.append(("Content-Type", mime_type))
+        if encoding:
+            tags.append(("Content-Encoding", encoding))
+        if hash:
+            tags.append(("File-Hash", hash))
+        return tags
+
+    def _prepare(self, file_path, file_buffer, hash=None):
+        """Return the payload and tags of a file, compressed when the compressor takes its MIME type."""
+        mime_type = self._get_mime_type(file_path, file_buffer)
+        if self.compressor is None or not self.compressor.accepts(mime_type, len(file_buffer)):
+            return file_buffer, self._get_tags(mime_type, hash)
+        with self.metrics.timed('compress'):
+            compressed = self.compressor.compress(file_buffer)
+        self.metrics.add_bytes('compress', len(file_buffer))
+        if len(compressed) >= len(file_buffer):
+            return file_buffer, self._get_tags(mime_type, hash)
+        self._inc_stats('arweave/compress/saved_bytes', len(file_buffer) - len(compressed))
+        return compressed, self._get_tags(mime_type, hash, self.compressor.encoding)
+
+    def _deferred_prepare(self, file_path, file_buffer, hash=None):
+        if self.compressor is None:
+            return defer.succeed(self._prepare(file_path, file_buffer, hash))
+        return threads.deferToThread(self._prepare, file_path, file_buffer, hash)
+
+    def create_dataitem(self, file_path, file_buffer, hash=None):
+        """
+        Build and sign a DataItem for the file without sending it.
+        The DataItem id is known as soon as it is signed.
+        """
+        data, tags = self._prepare(file_path, file_buffer, hash)
+        self._journal(hash, PENDING, path=file_path)
+        return self._create_dataitem(data, tags)
+
+    def deferred_create_dataitem(self, file_path, file_buffer, hash=None):
+        self._journal(hash, PENDING, path=file_path)
+        dfd = self._deferred_prepare(file_path, file_buffer, hash)
+        return dfd.addCallback(lambda prepared: self._deferred_create_dataitem(*prepared))
+
+    def _create_dataitem(self, data, tags, shard=None):
+        if shard is None:
+            with self.wallets.using(len(data)) as shard:
+                return self._create_dataitem(data, tags, shard)
+        with self.metrics.timed('sign'):
+            if self.signing_pool is not None:
+                dataitem = self.signing_pool.sign(data, tags, shard.index)
+            else:
+                dataitem = sign_dataitem(shard.wallet.rsa, data, tags)
+        self._signed(tags, dataitem.header.id)
+        return dataitem
+
+    def _deferred_create_dataitem(self, data, tags, shard=None):
+        if shard is None:
+            return self.wallets.deferred_using(
+                len(data), lambda shard: self._deferred_create_dataitem(data, tags, shard)
+            )
+        if self.signing_pool is not None:
+            dfd = self.signing_pool.deferred_sign(data, tags, shard.index)
+        else:
+            dfd = threads.deferToThread(sign_dataitem, shard.wallet.rsa, data, tags)
+        self.metrics.timed_deferred('sign', dfd)
+
+        def _signed(dataitem):
+            self._signed(tags, dataitem.header.id)
+            return dataitem
+
+        return dfd.addCallback(_signed)
+
+    def send_dataitem(self, dataitem):
+        return self._post_dataitem(DataItemReader.from_dataitem(dataitem))
+
+    def _post_dataitem(self, body):
+        # The body is read from the DataItem's header and data as it is sent, never joined into one copy.
+        # It is posted once rather than through pyarweave's HTTPClient, whose retry loop resends the used up
+        # body empty; throttled and failed requests are retried by the UploadScheduler.
+        from ar import ArweaveNetworkException
+
+        headers = {'Content-Type': 'application/octet-stream'}
+        body.seek(0)
+        with self.metrics.timed('bundler'):
+            response = self.session.post(
+                self.bundler_url + '/tx/arweave', data=body, headers=headers, timeout=self.timeout
+            )
+        if not response.ok:
+            raise ArweaveNetworkException(response.text, response.status_code, None, response)
+        self.metrics.add_bytes('bundler', len(body))
+        return response.json()['id']
+
+    def _send_transaction(self, file_handler, data_size, tags):
+        with self.metrics.timed('l1'):
+            txid = self._post_transaction(file_handler, data_size, tags)
+        self.metrics.add_bytes('l1', data_size)
+        return txid
+
+    def _post_transaction(self, file_handler, data_size, tags):
+        with self.wallets.using(data_size, funded=True) as shard:
+            return self._post_wallet_transaction(shard, file_handler, data_size, tags)
+
+    def _post_wallet_transaction(self, shard, file_handler, data_size, tags):
+        # A transaction whose chunks failed is resumed when the same file is uploaded again, rather than
+        # signed and paid for a second time.
+        file_hash = dict(tags).get('File-Hash')
+        interrupted = self._interrupted.pop(file_hash, None) if file_hash else None
+        if interrupted is not None:
+            tx, confirmed = interrupted
+            tx.file_handler = file_handler
+        else:
+            tx, confirmed = self._sign_transaction(shard, file_handler, data_size, tags), set()
         try:
-            tags = [create_tag("Content-Type", mime_type, True)]
-            if hash:
-                tags.append(create_tag("File-Hash", hash, True))
-            dataitem = DataItem(data=file_buffer, header=ANS104DataItemHeader(tags=tags))
-            dataitem.sign(self.wallet.rsa)
-            result = self.node.send_tx(dataitem.tobytes())
-            txid = result['id']
+            # Small transactions go through the chunk uploader as well, pyarweave's uploader installs a SIGPIPE
+            # handler when it is imported, which fails in the worker threads sending L1 transactions.
+            return self.chunk_uploader.upload(tx, file_handler, confirmed)
+        except Exception:
+            if file_hash:
+                self._interrupted[file_hash] = tx, confirmed
+            raise
+
+    def _sign_transaction(self, shard, file_handler, data_size, tags):
+        from ar.transaction import Transaction
+
+        tx = Transaction(shard.wallet, data=b'')
+        self._share_session(tx.peer)
+        # Only the price and anchor are fetched from here, the fastest gateway; nothing stored refers to it.
+        tx.api_url = self.gateways.primary.url
+        tx.file_handler = file_handler
+        tx.uses_uploader = True
+        tx.data_size = data_size
+        for name, value in tags:
+            tx.add_tag(name, value)
+        tx.sign()
+        self._signed(tags, tx.id)
+        self.wallets.record_spent(shard, int(tx.reward))
+        return tx
+
+    def upload(self, file_path, file_buffer, hash=None):
+        data, tags = self._prepare(file_path, file_buffer, hash)
+        self._journal(hash, PENDING, path=file_path)
+        return self._remember(hash, self._send(data, tags))
+
+    def upload_bundle(self, entries):
+        """
+        Send many signed DataItems as one ANS-104 bundle.
+        entries is a list of (dataitem, hash) pairs; every DataItem keeps its own id.
+        Returns the id of the bundle transaction.
+        """
+        txid = self._send(*self._get_bundle(entries))
+        self._remember_bundle(entries)
+        return txid
+
+    def upload_manifest(self, paths, index=None):
+        """
+        Publish an Arweave path manifest linking every path in paths (path -> tx id) under one id.
+        index is the path served when the manifest itself is requested.
+        """
+        from ar.manifest import CONTENT_TYPE as MANIFEST_CONTENT_TYPE
+        from ar.manifest import Manifest
+
+        data = Manifest(paths, index=index).tobytes()
+        return self._send(data, [("Content-Type", MANIFEST_CONTENT_TYPE)])
+
+    def _send(self, data, tags):
+        if self._route(len(data)) == BUNDLER:
+            try:
+                with self.wallets.using(len(data)) as shard:
+                    txid = self.send_dataitem(self._create_dataitem(data, tags, shard))
+            except Exception as exc:
+                if not self._bundler_failed(exc):
+                    raise
+            else:
+                self.router.record_success()
+                return txid
+        return self._send_transaction(BufferReader(data), len(data), tags)
+
+    def upload_file(self, file, hash=None, compressor=None):
+        """
+        Upload an open binary file without reading it into memory.
+        The DataItem is hashed and signed from the file in chunks and streamed to the bundler,
+        L1 transactions are chunked from the file handle.
+        With a compressor that takes the file's MIME type, a compressed copy is streamed instead.
+        """
+        size = os.fstat(file.fileno()).st_size
+        file.seek(0)
+        mime_type = self._get_mime_type(file.name, file.read(2048))
+        if compressor is None or not compressor.accepts(mime_type, size):
+            return self._upload_file(file, size, self._get_tags(mime_type, hash), hash)
+
+        file.seek(0)
+        with self.metrics.timed('compress'):
+            compressed = compressor.compress_file(file)
+        self.metrics.add_bytes('compress', size)
+        with compressed:
+            compressed_size = os.fstat(compressed.fileno()).st_size
+            if compressed_size >= size:
+                return self._upload_file(file, size, self._get_tags(mime_type, hash), hash)
+            self._inc_stats('arweave/compress/saved_bytes', size - compressed_size)
+            tags = self._get_tags(mime_type, hash, compressor.encoding)
+            return self._upload_file(compressed, compressed_size, tags, hash)
+
+    def _upload_file(self, file, size, tags, hash):
+        self._journal(hash, PENDING)
+        if self._route(size) == BUNDLER:
+            try:
+                with self.wallets.using(size) as shard:
+                    with self.metrics.timed('sign'):
+                        header = sign_dataitem_header(shard.wallet.rsa, file, size, tags)
+                    self._signed(tags, header.id)
+                    txid = self._post_dataitem(DataItemReader(header.tobytes(), file, size))
+            except Exception as exc:
+                if not self._bundler_failed(exc):
+                    raise
+            else:
+                self.router.record_success()
+                return self._remember(hash, txid)
+        file.seek(0)
+        return self._remember(hash, self._send_transaction(file, size, tags))
+
+    def _route(self, size):
+        route = self.router.choose(size)
+        self._inc_stats('arweave/route/%s' % route)
+        return route
+
+    def _bundler_failed(self, exc):
+        """Record a failed bundler upload, returns True if the payload is sent as an L1 transaction instead."""
+        self.router.record_failure()
+        if not self.router.falls_back(exc):
+            return False
+        logger.warning('Bundler upload failed, sending an L1 transaction instead: %s', exc)
+        self._inc_stats('arweave/route/fallback')
+        return True
+
+    def _inc_stats(self, key, count=1):
+        self.metrics.inc(key, count)
+
+    def _journal(self, hash, state, path=None, id=None):
+        if self.journal is not None:
+            self.journal.record(hash, state, path=path, id=id)
+
+    def _signed(self, tags, id):
+        self._journal(dict(tags).get("File-Hash"), SIGNED, id=id)
+
+    def _get_bundle(self, entries):
+        bundle = serialize_bundle([dataitem for dataitem, _ in entries])
+        return bundle, [("Bundle-Format", "binary"), ("Bundle-Version", "2.0.0")]
+
+    def _remember_bundle(self, entries):
+        for dataitem, hash in entries:
+            self._remember(hash, dataitem.header.id)
+
+    def deferred_upload(self, file_path, file_buffer, hash=None):
+        """
+        Deferred version of upload.
+        Uses the reactor-native HTTP client when one is configured, otherwise runs upload in a thread.
+        """
+        if self.http is None:
+            return threads.deferToThread(self.upload, file_path, file_buffer, hash)
+        self._journal(hash, PENDING, path=file_path)
+        dfd = self._deferred_prepare(file_path, file_buffer, hash)
+        dfd.addCallback(lambda prepared: self._deferred_send(*prepared))
+        return dfd.addCallback(lambda txid: self._remember(hash, txid))
+
+    def deferred_upload_bundle(self, entries):
+        if self.http is None:
+            return threads.deferToThread(self.upload_bundle, entries)
+        dfd = threads.deferToThread(self._get_bundle, entries)
+        dfd.addCallback(lambda result: self._deferred_send(*result))
+        return dfd.addCallback(lambda txid: self._remember_bundle(entries) or txid)
+
+    def deferred_send_dataitem(self, dataitem):
+        if self.http is None:
+            return threads.deferToThread(self.send_dataitem, dataitem)
+        body = DataItemReader.from_dataitem(dataitem)
+        dfd = self.metrics.timed_deferred('bundler', self.http.post_bytes(self.bundler_url + '/tx/arweave', body))
+        self.metrics.add_bytes('bundler', len(body))
+        return dfd.addCallback(lambda result: result['id'])
+
+    def deferred_submit_dataitem(self, dataitem, hash=None):
+        """Send a DataItem signed earlier to the bundler and remember it under hash, fires with its id."""
+
+        def _sent(txid):
+            self.router.record_success()
+            return self._remember(hash, txid)
+
+        def _failed(failure):
+            self.router.record_failure()
+            return failure
+
+        dfd = self.deferred_send_dataitem(dataitem)
+        dfd.addCallbacks(_sent, _failed)
+        return dfd
+
+    def _deferred_send(self, data, tags):
+        # Signing is CPU bound and runs in a thread or the signing pool, and the L1 uploader is blocking;
+        # only the bundler request goes through the reactor.
+        def _sent(txid):
+            self.router.record_success()
             return txid
-        except:
-            pass
 
-        try:
-            with open(file_path, 'rb', buffering=0) as file_handler:
-                tx = Transaction(self.wallet, file_handler=file_handler, file_path=file_path)
-                tx.api_url = self.GATEWAY_URL
-                tx.add_tag('Content-Type', mime_type)
-                if hash:
-                    tx.add_tag('File-Hash', hash)
-                tx.sign()
-
-                uploader = get_uploader(tx, file_handler)
-
-                while not uploader.is_complete:
-                    uploader.upload_chunk()
-                return tx.id
-        except:
-            pass
+        def _send_transaction(failure=None):
+            if failure is not None and not self._bundler_failed(failure.value):
+                return failure
+            return threads.deferToThread(self._send_transaction, BufferReader(data), len(data), tags)
+
+        def _sign_and_send(shard):
+            dfd = self._deferred_create_dataitem(data, tags, shard)
+            return dfd.addCallback(self.deferred_send_dataitem)
 
-        raise Exception("Upload Error")
+        if self._route(len(data)) != BUNDLER:
+            return _send_transaction()
+        dfd = self.wallets.deferred_using(len(data), _sign_and_send)
+        dfd.addCallbacks(_sent, _send_transaction)
+        return dfd
+
+    def _remember(self, hash, tx_id, state=SUBMITTED):
+        if hash and self.index is not None:
+            self.index.set(hash, tx_id)
+        self._journal(hash, state, id=tx_id)
+        return tx_id
 
     def get_tx_id(self, hash):
+        found, _ = self._get_indexed_tx_ids([hash])
+        if hash in found:
+            self._count_lookups([hash], 1, found)
+            return found[hash]
+
         query = '''query {
             transactions(
                 first: 1,
@@ -107,11 +594,215 @@ class ArweaveStorageClient:
                     }
                 }
             }
-        }''' % (
-            hash
-        )
-        response = self.peer.graphql(query)
-        return response.get("data").get("transactions").get("edges")[0].get("node").get("id")
+        }''' % (hash)
+        with self.metrics.timed('lookup'):
+            response = self._graphql(query)
+        edges = response.get("data").get("transactions").get("edges")
+        self._count_lookups([hash], 0, {hash: None} if edges else {})
+        if not edges:
+            raise KeyError(hash)
+        return self._remember(hash, edges[0].get("node").get("id"), CONFIRMED)
+
+    def get_tx_ids(self, hashes):
+        """
+        Look up many file hashes at once, following pagination until every hash is found.
+        Returns a dict of hash to transaction id containing only the hashes that were found.
+        """
+        found, missing = self._get_indexed_tx_ids(hashes)
+        local = len(found)
+        after = ''
+        values = ', '.join('"%s"' % hash for hash in sorted(missing))
+        while missing:
+            with self.metrics.timed('lookup'):
+                response = self._graphql(HASH_LOOKUP_QUERY % (values, after))
+            after = self._collect_tx_ids(response, found, missing)
+            if after is None:
+                break
+        self._count_lookups(hashes, local, found)
+        return found
+
+    @defer.inlineCallbacks
+    def deferred_get_tx_ids(self, hashes):
+        """Deferred version of get_tx_ids, see deferred_upload."""
+        if self.http is None:
+            found = yield threads.deferToThread(self.get_tx_ids, hashes)
+            return found
+
+        found, missing = self._get_indexed_tx_ids(hashes)
+        local = len(found)
+        after = ''
+        values = ', '.join('"%s"' % hash for hash in sorted(missing))
+        while missing:
+            query = {'operationName': None, 'query': HASH_LOOKUP_QUERY % (values, after), 'variables': {}}
+            dfd = self.gateways.deferred_call(functools.partial(self._deferred_graphql, query=query), hedge=True)
+            response = yield self.metrics.timed_deferred('lookup', dfd)
+            after = self._collect_tx_ids(response, found, missing)
+            if after is None:
+                break
+        self._count_lookups(hashes, local, found)
+        return found
+
+    def deferred_get_tx_id(self, hash):
+        def _get_tx_id(found):
+            if hash not in found:
+                raise KeyError(hash)
+            return found[hash]
+
+        return self.deferred_get_tx_ids([hash]).addCallback(_get_tx_id)
+
+    def get_confirmed_ids(self, ids):
+        """Return the set of ids, at most 100, that the gateway has indexed."""
+        with self.metrics.timed('confirm'):
+            response = self._graphql(CONFIRM_QUERY % ', '.join('"%s"' % id for id in ids))
+        return self._collect_ids(response)
+
+    def deferred_get_confirmed_ids(self, ids):
+        if self.http is None:
+            return threads.deferToThread(self.get_confirmed_ids, ids)
+        query = {'operationName': None, 'query': CONFIRM_QUERY % ', '.join('"%s"' % id for id in ids), 'variables': {}}
+        dfd = self.gateways.deferred_call(functools.partial(self._deferred_graphql, query=query))
+        return self.metrics.timed_deferred('confirm', dfd).addCallback(self._collect_ids)
+
+    def _collect_ids(self, response):
+        return {edge.get("node").get("id") for edge in response.get("data").get("transactions").get("edges")}
+
+    def confirm(self, hash, tx_id):
+        self._journal(hash, CONFIRMED, id=tx_id)
+
+    def forget(self, hash):
+        """Drop an upload that never landed from the index, the journal shows it as pending again."""
+        if hash and self.index is not None:
+            self.index.delete(hash)
+        self._journal(hash, PENDING)
+
+    def _graphql(self, query):
+        return self.gateways.hedged(lambda peer: peer.graphql(query))
+
+    def _deferred_graphql(self, gateway, query):
+        return self.http.post_json(gateway.url + '/graphql', query)
+
+    def _get_indexed_tx_ids(self, hashes):
+        found = {}
+        missing = set(hashes)
+        for hash in hashes:
+            tx_id = self.index.get(hash) if self.index is not None else None
+            if not tx_id and self.journal is not None:
+                tx_id = self.journal.get(hash)
+            if tx_id:
+                found[hash] = tx_id
+                missing.discard(hash)
+        return found, missing
+
+    def _count_lookups(self, hashes, local, found):
+        """Count hashes answered by the local index or journal, found by GraphQL, or not uploaded yet."""
+        if local:
+            self.metrics.inc('arweave/dedup/local_hit', local)
+        if len(found) > local:
+            self.metrics.inc('arweave/dedup/hit', len(found) - local)
+        missing = len(set(hashes)) - len(found)
+        if missing:
+            self.metrics.inc('arweave/dedup/miss', missing)
+
+    def _collect_tx_ids(self, response, found, missing):
+        """Move the hashes found in one page of results from missing to found, returns the next page cursor."""
+        after = ''
+        transactions = response.get("data").get("transactions")
+        for edge in transactions.get("edges"):
+            after = ', after: "%s"' % edge.get("cursor")
+            node = edge.get("node")
+            for tag in node.get("tags"):
+                hash = tag.get("value")
+                if tag.get("name") == "File-Hash" and hash in missing:
+                    found[hash] = self._remember(hash, node.get("id"), CONFIRMED)
+                    missing.discard(hash)
+        if not transactions.get("pageInfo").get("hasNextPage"):
+            return None
+        return after
+
+    def warm_up_index(self):
+        """
+        Fill the local hash index with the File-Hash tags of every transaction owned by the wallets.
+        Returns the number of hashes added to the index.
+        """
+        if self.index is None:
+            return 0
+        return sum(self._warm_up_index(shard.address) for shard in self.wallets)
+
+    def _warm_up_index(self, address):
+        count = 0
+        after = ''
+        while True:
+            response = self._graphql(WARM_UP_QUERY % (address, after))
+            transactions = response.get("data").get("transactions")
+            found = {}
+            for edge in transactions.get("edges"):
+                after = ', after: "%s"' % edge.get("cursor")
+                node = edge.get("node")
+                for tag in node.get("tags"):
+                    if tag.get("name") == "File-Hash":
+                        found[tag.get("value")] = node.get("id")
+            self.index.update(found)
+            count += len(found)
+            if not transactions.get("pageInfo").get("hasNextPage"):
+                return count
 
     def get_url(self, tx_id):
+        # Permalinks are stored with the items, they use the configured gateway rather than the fastest one.
         return urljoin(self.GATEWAY_URL, tx_id)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_magic = None
+
+
+def _get_magic():
+    """Return the python-magic module, or None when it is not installed. The import is only tried once."""
+    global _magic
+    if _magic is None:
+        try:
+            import magic
+        except ImportError:
+            magic = False
+        _magic = magic
+    return _magic or None
+
+
+def get_client(settings, wallet_jwk=None, gateway_url=None):
+    """
+    Return the client of the process for the wallet and gateway, creating it from settings on first use.
+    Stores, pipelines and feeds using the same wallet share its wallet, signing pool and HTTP connections.
+    Every call is paired with a release_client call once the caller is done with the client.
+    """
+    wallet_jwk = wallet_jwk or settings.get('WALLET_JWK')
+    gateway_url = gateway_url or settings.get('GATEWAY_URL') or 'https://arweave.net'
+    key = (_wallet_key(wallet_jwk), gateway_url)
+    with _clients_lock:
+        if key not in _clients:
+            client = ArweaveStorageClient.from_settings(settings, wallet_jwk=wallet_jwk, gateway_url=gateway_url)
+            _clients[key] = [client, 0]
+        _clients[key][1] += 1
+        return _clients[key][0]
+
+
+def release_client(client):
+    """Drop one user of a client returned by get_client, the last user closes it."""
+    with _clients_lock:
+        for key, entry in list(_clients.items()):
+            if entry[0] is client:
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return None
+                del _clients[key]
+    return client.close()
+
+
+def _wallet_key(wallet_jwk):
+    if isinstance(wallet_jwk, (list, tuple)):
+        return tuple(_wallet_key(jwk) for jwk in wallet_jwk)
+    if isinstance(wallet_jwk, dict):
+        return json.dumps(wallet_jwk, sort_keys=True)
+    if wallet_jwk and os.path.isfile(wallet_jwk):
+        return os.path.abspath(wallet_jwk)
+    return wallet_jwk
@@ -0,0 +1,83 @@
+import fnmatch
+import gzip
+import shutil
+from tempfile import NamedTemporaryFile
+
+from scrapy.exceptions import NotConfigured
+
+CHUNK_SIZE = 1024 * 1024
+
+COMPRESSIBLE_MIME_TYPES = (
+    'text/*',
+    'application/json',
+    'application/jsonl',
+    'application/x-ndjson',
+    'application/xml',
+    'application/javascript',
+    'application/x-javascript',
+    'image/svg+xml',
+)
+
+
+class Compressor:
+    """
+    Compresses uploads with gzip or zstd (needs the zstandard package) when their MIME type matches one of
+    mime_types and they are at least min_size bytes. Uploads are tagged with Content-Encoding, File-Hash
+    stays the hash of the original content so dedup lookups keep working.
+    """
+
+    def __init__(self, codec='gzip', min_size=1024, mime_types=COMPRESSIBLE_MIME_TYPES, level=None):
+        if codec not in ('gzip', 'zstd'):
+            raise NotConfigured('Unknown ARWEAVE_COMPRESSION codec %r, use gzip or zstd' % codec)
+        if codec == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise NotConfigured('ARWEAVE_COMPRESSION zstd requires installing zstandard')
+            self._zstd = zstandard.ZstdCompressor(level=3 if level is None else level)
+        self.codec = codec
+        self.min_size = min_size
+        self.mime_types = mime_types
+        self.level = 6 if level is None else level
+
+    @classmethod
+    def from_settings(cls, settings, codec=None):
+        """Return None unless ARWEAVE_COMPRESSION, or codec which takes precedence, names a codec."""
+        codec = settings.get('ARWEAVE_COMPRESSION') if codec is None else codec
+        if not codec:
+            return None
+        level = settings.get('ARWEAVE_COMPRESSION_LEVEL')
+        return cls(
+            codec,
+            min_size=settings.getint('ARWEAVE_COMPRESSION_MIN_SIZE', 1024),
+            mime_types=settings.getlist('ARWEAVE_COMPRESSION_MIME_TYPES', COMPRESSIBLE_MIME_TYPES),
+            level=int(level) if level is not None else None,
+        )
+
+    @property
+    def encoding(self):
+        return self.codec
+
+    def accepts(self, mime_type, size):
+        if size < self.min_size or not mime_type:
+            return False
+        mime_type = mime_type.split(';')[0].strip().lower()
+        return any(fnmatch.fnmatch(mime_type, pattern) for pattern in self.mime_types)
+
+    def compress(self, data):
+        if self.codec == 'zstd':
+            return self._zstd.compress(data)
+        # mtime=0 keeps the output, and so the upload, the same for the same content.
+        return gzip.compress(data, self.level, mtime=0)
+
+    def compress_file(self, file):
+        """Compress file from its current position into a new temporary file, returned rewound."""
+        compressed = NamedTemporaryFile(prefix='arweave-compressed-')
+        if self.codec == 'zstd':
+            self._zstd.copy_stream(file, compressed, read_size=CHUNK_SIZE)
+        else:
+            with gzip.GzipFile(fileobj=compressed, mode='wb', compresslevel=self.level, mtime=0) as gz:
+                shutil.copyfileobj(file, gz, CHUNK_SIZE)
+        compressed.flush()
+        compressed.seek(0)
+        return compressed
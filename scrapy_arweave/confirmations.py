@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+
+from twisted.internet import defer, task
+
+from . import signals
+
+logger = logging.getLogger(__name__)
+
+# GraphQL answers at most 100 transactions per page.
+MAX_BATCH_SIZE = 100
+
+
+class ConfirmationTracker:
+    """
+    Collects the ids of submitted uploads and checks every `interval` seconds which of them the gateway has
+    indexed, batch_size ids per GraphQL query. Ids still unknown `grace` seconds after they were submitted
+    are reported missing and handed to reupload(hash, path), at most max_retries times per hash.
+    """
+
+    signals = None
+
+    def __init__(self, client, interval=60, batch_size=MAX_BATCH_SIZE, grace=1800, max_retries=3, reupload=None):
+        self.client = client
+        self.interval = interval
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.grace = grace
+        self.max_retries = max_retries
+        self.reupload = reupload
+        self._pending = {}
+        self._retries = {}
+        self._lock = threading.Lock()
+        self._loop = None
+
+    @classmethod
+    def from_settings(cls, client, settings, reupload=None):
+        interval = settings.getfloat('ARWEAVE_CONFIRM_INTERVAL', 0)
+        if interval <= 0:
+            return None
+        return cls(
+            client,
+            interval=interval,
+            batch_size=settings.getint('ARWEAVE_CONFIRM_BATCH_SIZE', MAX_BATCH_SIZE),
+            grace=settings.getfloat('ARWEAVE_CONFIRM_GRACE', 1800),
+            max_retries=settings.getint('ARWEAVE_CONFIRM_MAX_RETRIES', 3),
+            reupload=reupload,
+        )
+
+    def __len__(self):
+        return len(self._pending)
+
+    def track(self, tx_id, hash=None, path=None):
+        """Add a submitted upload to the next checks, returns tx_id so it can be used as a callback."""
+        with self._lock:
+            self._pending[tx_id] = (hash, path, time.time())
+        return tx_id
+
+    def start(self):
+        self._loop = task.LoopingCall(self.check)
+        self._loop.start(self.interval, now=False)
+
+    def stop(self):
+        """Stop the periodic checks and check once more, returns a Deferred that fires when done."""
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        self._loop = None
+        dfd = self.check() if self._pending else defer.succeed(0)
+        return dfd.addCallback(self._stopped)
+
+    def _stopped(self, _):
+        if self._pending:
+            logger.info('%d Arweave uploads were not confirmed before the spider closed', len(self._pending))
+
+    @defer.inlineCallbacks
+    def check(self):
+        """Check every tracked id once, returns the number of ids confirmed."""
+        with self._lock:
+            ids = list(self._pending)
+        count = 0
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start : start + self.batch_size]
+            try:
+                confirmed = yield self.client.deferred_get_confirmed_ids(batch)
+            except Exception as exc:
+                # Tried again on the next run, an error here would stop the loop.
+                logger.warning('Checking Arweave upload confirmations failed: %s', exc)
+                break
+            now = time.time()
+            for tx_id in batch:
+                if tx_id in confirmed:
+                    self._confirmed(tx_id)
+                    count += 1
+                elif now - self._pending[tx_id][2] >= self.grace:
+                    self._missing(tx_id)
+        return count
+
+    def _confirmed(self, tx_id):
+        with self._lock:
+            hash, _, _ = self._pending.pop(tx_id)
+        self.client.confirm(hash, tx_id)
+        self._inc_stats('arweave/confirm/confirmed')
+        self._send_signal(signals.upload_confirmed, hash=hash, tx_id=tx_id)
+
+    def _missing(self, tx_id):
+        with self._lock:
+            hash, path, _ = self._pending.pop(tx_id)
+        logger.warning('Upload %s of %s did not land after %d seconds', tx_id, path or hash, self.grace)
+        self.client.forget(hash)
+        self._inc_stats('arweave/confirm/missing')
+        self._send_signal(signals.upload_missing, hash=hash, tx_id=tx_id)
+
+        if self.reupload is None or not hash or self._retries.get(hash, 0) >= self.max_retries:
+            return
+        self._retries[hash] = self._retries.get(hash, 0) + 1
+        dfd = defer.maybeDeferred(self.reupload, hash, path)
+        dfd.addCallback(self._requeued, hash, path)
+        dfd.addErrback(lambda failure: logger.error('Upload of %s failed again: %s', path or hash, failure.value))
+
+    def _requeued(self, tx_id, hash, path):
+        if tx_id:
+            self._inc_stats('arweave/confirm/requeued')
+            self.track(tx_id, hash, path)
+        return tx_id
+
+    def _send_signal(self, signal, **kwargs):
+        if self.signals is not None:
+            self.signals.send_catch_log(signal, **kwargs)
+
+    def _inc_stats(self, key, count=1):
+        self.client.metrics.inc(key, count)
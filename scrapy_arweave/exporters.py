@@ -0,0 +1,47 @@
+from scrapy.exceptions import NotConfigured
+from scrapy.exporters import BaseItemExporter
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """
+    Writes items as a Parquet file, row_group_size items per row group. The file footer holds the byte range of
+    every column of every row group, so readers fetch only the row groups and columns they need from the gateway
+    with range requests instead of downloading the whole feed. Needs pyarrow (pip install scrapy-arweave[parquet]).
+
+    The columns and their types are taken from the first row group unless FEEDS fields lists the columns.
+    """
+
+    def __init__(self, file, row_group_size=10000, compression='snappy', **kwargs):
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise NotConfigured('The parquet feed format requires installing pyarrow')
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self._rows = []
+        self._writer = None
+
+    def export_item(self, item):
+        self._rows.append(dict(self._get_serialized_fields(item, default_value=None)))
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def finish_exporting(self):
+        if self._rows:
+            self._write_row_group()
+        if self._writer is not None:
+            self._writer.close()
+
+    def _write_row_group(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = pa.Table.from_pylist(self._rows)
+            self._writer = pq.ParquetWriter(self.file, table.schema, compression=self.compression)
+        else:
+            table = pa.Table.from_pylist(self._rows, schema=self._writer.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._rows = []
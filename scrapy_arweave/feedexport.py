@@ -1,30 +1,176 @@
+import json
 import logging
+import os
 from urllib.parse import urlparse
 
-from scrapy.extensions.feedexport import BlockingFeedStorage
+from scrapy import signals
+from scrapy.extensions.feedexport import BlockingFeedStorage, ItemFilter
+from scrapy.utils.misc import load_object
 from scrapy.utils.project import get_project_settings
+from twisted.internet import defer, threads
+from twisted.python.failure import Failure
+
+from .compression import Compressor
+from .feedindex import LINE_FORMATS, line_index
+from .rolling import RollingFeedFile, part_name
+from .scheduler import UploadScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class ArweaveFeedStorage(BlockingFeedStorage):
-    def __init__(self, uri, *, feed_options=None):
-        settings = get_project_settings()
-        from .client import ArweaveStorageClient
+    def __init__(self, uri, *, feed_options=None, settings=None):
+        settings = settings or get_project_settings()
+        feed_options = feed_options or {}
 
         u = urlparse(uri)
         self.file_name = u.path if u.path else u.netloc
-        gateway_url = settings.get("GATEWAY_URL", "https://arweave.net")
-        wallet_jwk = settings.get("WALLET_JWK")
-        self.client = ArweaveStorageClient(wallet_jwk, gateway_url)
+        self.settings = settings
+        self.client = None
+        self.stats = None
+        self.part_items = settings.getint('ARWEAVE_FEED_PART_ITEMS', 0)
+        self.part_size = settings.getint('ARWEAVE_FEED_PART_SIZE', 0)
+        self.part_interval = settings.getfloat('ARWEAVE_FEED_PART_INTERVAL', 0)
+        self.rolling = bool(self.part_items or self.part_size or self.part_interval)
+        if self.rolling and feed_options.get('format', 'jsonlines') not in LINE_FORMATS:
+            logger.warning('Feed %s is not rolled, only parts of a jsonlines feed are valid on their own', uri)
+            self.rolling = False
+        # Parts are cut by counting the items this feed exports, not every item scraped.
+        self.item_filter = load_object(feed_options.get('item_filter', ItemFilter))(feed_options)
+        # FEEDS = {'ar://items.jsonl': {'format': 'jsonlines', 'arweave_compression': 'zstd'}}, False disables it
+        self.compressor = Compressor.from_settings(settings, codec=feed_options.get('arweave_compression'))
+        # FEEDS = {'ar://items.jsonl': {'format': 'jsonlines', 'arweave_index_items': 1000}}
+        self.index_items = int(feed_options.get('arweave_index_items', settings.getint('ARWEAVE_FEED_INDEX_ITEMS', 0)))
+        if self.index_items and (self.rolling or feed_options.get('format', 'jsonlines') not in LINE_FORMATS):
+            logger.warning('Feed %s is not indexed, chunk indexes need a jsonlines feed that is not rolled', uri)
+            self.index_items = 0
+        if self.index_items:
+            # The index points at byte ranges of the stored feed, which must stay uncompressed.
+            self.compressor = None
+        self.scheduler = UploadScheduler.from_settings(settings)
+        self.file = None
+        self.signals = None
+        self.parts = []
+        self.uploads = []
+
+    @classmethod
+    def from_crawler(cls, crawler, uri, *, feed_options=None):
+        storage = cls(uri, feed_options=feed_options, settings=crawler.settings)
+        storage.stats = crawler.stats
+        if storage.rolling:
+            # Connected after the feed exporter, so the item is already written when this runs.
+            storage.signals = crawler.signals
+            crawler.signals.connect(storage.item_scraped, signal=signals.item_scraped)
+        return storage
+
+    def open(self, spider):
+        from .client import get_client
+
+        # Taken here rather than in __init__, Scrapy also builds storages it never opens to validate FEEDS.
+        self.client = get_client(self.settings)
+        if self.stats is not None:
+            self.client.stats = self.stats
+        self.scheduler.metrics = self.client.metrics
+        if not self.rolling:
+            return super().open(spider)
+        self.file = RollingFeedFile(self.part_items, self.part_size, self.part_interval)
+        return self.file
+
+    def item_scraped(self, item, spider):
+        if self.file is None or self.file.closed or not self.item_filter.accepts(item):
+            return
+        if self.file.item_written():
+            self._upload_part()
+
+    def _upload_part(self, last=False):
+        """Cut the current part of a rolling feed and upload it in the background."""
+        name = part_name(self.file_name, len(self.parts))
+        part = self.file.cut(last)
+        self.parts.append(name)
+        self.uploads.append(self._upload(part).addBoth(self._part_stored, part, name))
+
+    def _part_stored(self, result, part, name):
+        part.close()
+        if isinstance(result, Failure):
+            logger.error('Feed part %s failed: %s', name, result.getErrorMessage())
+        else:
+            logger.info('Feed part %s: %s', name, self.client.get_url(result))
+        return result
+
+    def store(self, file):
+        if self.rolling:
+            dfd = self._store_parts(file)
+        else:
+            dfd = self._upload(file)
+            if self.index_items:
+                dfd.addCallback(lambda tx_id: threads.deferToThread(self._upload_index, file, tx_id))
+            dfd.addCallback(self._stored, file)
+        return dfd.addBoth(self._release)
+
+    def _release(self, result):
+        from .client import release_client
+
+        release_client(self.client)
+        return result
+
+    def _store_parts(self, file):
+        if self.signals is not None:
+            self.signals.disconnect(self.item_scraped, signal=signals.item_scraped)
+        if file.size or not self.parts:
+            self._upload_part(last=True)
+        else:
+            file.cut(last=True).close()
+
+        dfd = defer.gatherResults(self.uploads, consumeErrors=True)
+        dfd.addErrback(lambda failure: failure.value.subFailure)
+        dfd.addCallback(
+            lambda tx_ids: threads.deferToThread(
+                self.client.upload_manifest, dict(zip(self.parts, tx_ids)), index=self.parts[0]
+            )
+        )
+        dfd.addCallback(self._stored, file)
+        return dfd
+
+    def _upload(self, file):
+        """
+        Return a Deferred with the tx id of file, uploading it unless the same content is already stored.
+        Uploads go through the scheduler, which retries them when the bundler or gateway is throttled or down.
+        """
+        file.seek(0, os.SEEK_END)
+        endpoint = self.client.router.choose(file.tell())
+        if self.client.http is None:
+            return self.scheduler.submit(endpoint, threads.deferToThread, self._upload_in_thread, file)
+
+        def _upload(_, file_hash):
+            return self.scheduler.submit(
+                endpoint, threads.deferToThread, self.client.upload_file, file, file_hash, self.compressor
+            )
+
+        def _lookup(file_hash):
+            dfd = self.client.deferred_get_tx_id(file_hash)
+            return dfd.addErrback(_upload, file_hash)
 
-    def _store_in_thread(self, file):
         file.seek(0)
+        dfd = threads.deferToThread(self.client.calculate_hash, file.name)
+        return dfd.addCallback(_lookup)
+
+    def _upload_in_thread(self, file):
+        file.seek(0)
+        file_hash = self.client.calculate_hash(file.name)
         try:
-            file_hash = self.client.calculate_hash(file.name)
-            tx_id = self.client.get_tx_id(file_hash)
+            return self.client.get_tx_id(file_hash)
         except:
-            tx_id = self.client.upload(file.name, file.read())
+            return self.client.upload_file(file, file_hash, self.compressor)
+
+    def _upload_index(self, file, tx_id):
+        """Upload the chunk index of the feed next to it, returns the id of a manifest linking both."""
+        index = dict(line_index(file, self.index_items), data=tx_id)
+        name = os.path.basename(self.file_name)
+        index_name = name + '.index.json'
+        index_id = self.client.upload(index_name, json.dumps(index).encode())
+        return self.client.upload_manifest({name: tx_id, index_name: index_id}, index=name)
+
+    def _stored(self, tx_id, file):
         permalink = self.client.get_url(tx_id)
         logging.info(permalink)
         file.close()
@@ -35,3 +181,9 @@ def get_feed_storages():
         '': 'scrapy_arweave.feedexport.ArweaveFeedStorage',
         'ar': 'scrapy_arweave.feedexport.ArweaveFeedStorage',
     }
+
+
+def get_feed_exporters():
+    return {
+        'parquet': 'scrapy_arweave.exporters.ParquetItemExporter',
+    }
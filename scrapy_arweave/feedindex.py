@@ -0,0 +1,23 @@
+LINE_FORMATS = ('jsonlines', 'jsonl', 'jl')
+
+
+def line_index(file, chunk_items):
+    """
+    Byte ranges of consecutive chunks of chunk_items lines of a JSON lines feed, so readers can fetch a chunk
+    with a range request (bytes=offset-(offset + length - 1)) instead of the whole feed.
+    The file is read from the start and rewound afterwards.
+    """
+    chunks = []
+    size = items = 0
+    start = first = 0
+    file.seek(0)
+    for line in file:
+        size += len(line)
+        items += 1
+        if items - first == chunk_items:
+            chunks.append({'offset': start, 'length': size - start, 'first_item': first, 'items': items - first})
+            start, first = size, items
+    if items > first:
+        chunks.append({'offset': start, 'length': size - start, 'first_item': first, 'items': items - first})
+    file.seek(0)
+    return {'version': 1, 'items': items, 'size': size, 'chunk_items': chunk_items, 'chunks': chunks}
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from twisted.internet import defer
+
+from .scheduler import is_retryable
+
+logger = logging.getLogger(__name__)
+
+
+class Gateway:
+    def __init__(self, url, session=None):
+        self.url = url
+        self.session = session
+        self.latency = None
+        self.failures = 0
+        self.unhealthy_until = 0
+        self._peer = None
+
+    @property
+    def peer(self):
+        # Created on first use, importing pyarweave is left out of spider startup.
+        if self._peer is None:
+            from ar.peer import Peer
+
+            peer = Peer(self.url)
+            if self.session is not None:
+                peer.session = self.session
+            self._peer = peer
+        return self._peer
+
+    @property
+    def healthy(self):
+        return time.time() >= self.unhealthy_until
+
+    def __repr__(self):
+        return 'Gateway(%r)' % self.url
+
+
+class GatewayPool:
+    """
+    Sends GraphQL lookups, L1 transactions and chunks to the fastest healthy of several gateways.
+    Latency is tracked per gateway as a moving average, and a gateway failing max_failures times in a row
+    is skipped for `cooldown` seconds while requests fail over to the next one. With hedge_delay set,
+    a lookup still unanswered after that many seconds is also sent to the next gateway and the first
+    answer wins.
+    """
+
+    metrics = None
+
+    def __init__(self, urls, max_failures=3, cooldown=60, hedge_delay=0, smoothing=0.3):
+        self.gateways = [Gateway(url) for url in urls]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.hedge_delay = hedge_delay
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_settings(cls, settings, gateway_url):
+        urls = [gateway_url] + [url for url in settings.getlist('ARWEAVE_GATEWAYS') if url != gateway_url]
+        return cls(
+            urls,
+            max_failures=settings.getint('ARWEAVE_GATEWAY_MAX_FAILURES', 3),
+            cooldown=settings.getfloat('ARWEAVE_GATEWAY_COOLDOWN', 60),
+            hedge_delay=settings.getfloat('ARWEAVE_GATEWAY_HEDGE_DELAY', 0),
+        )
+
+    def __iter__(self):
+        return iter(self.gateways)
+
+    @property
+    def primary(self):
+        return self.ordered()[0]
+
+    def ordered(self):
+        """
+        Healthy gateways from the fastest, untried ones first and those that just failed last,
+        then the others by the end of their cooldown.
+        """
+        healthy = [gateway for gateway in self.gateways if gateway.healthy]
+        unhealthy = [gateway for gateway in self.gateways if not gateway.healthy]
+        healthy.sort(key=lambda gateway: (gateway.failures, gateway.latency or 0))
+        unhealthy.sort(key=lambda gateway: gateway.unhealthy_until)
+        return healthy + unhealthy
+
+    def record_success(self, gateway, seconds):
+        with self._lock:
+            gateway.failures = 0
+            if gateway.latency is None:
+                gateway.latency = seconds
+            else:
+                gateway.latency += self.smoothing * (seconds - gateway.latency)
+
+    def record_failure(self, gateway, exc):
+        logger.info('Gateway %s failed: %s', gateway.url, exc)
+        self._inc_stats('arweave/gateway/failures')
+        with self._lock:
+            gateway.failures += 1
+            if gateway.failures >= self.max_failures:
+                gateway.failures = 0
+                gateway.unhealthy_until = time.time() + self.cooldown
+
+    def call(self, func, gateways=None):
+        """
+        Return func(peer) from the first gateway that answers, trying them in order.
+        Errors that are not the gateway's fault are raised at once.
+        """
+        error = None
+        for gateway in gateways or self.ordered():
+            try:
+                return self._call(func, gateway)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    raise
+                error = exc
+                self._inc_stats('arweave/gateway/failovers')
+        raise error
+
+    def hedged(self, func):
+        """Like call, but func also runs on the next gateway when the first has not answered after hedge_delay."""
+        gateways = self.ordered()
+        if not self.hedge_delay or len(gateways) < 2:
+            return self.call(func, gateways)
+
+        executor = self._get_executor()
+        futures = [executor.submit(self._call, func, gateways[0])]
+        done, _ = wait(futures, timeout=self.hedge_delay)
+        if not done:
+            self._inc_stats('arweave/gateway/hedged')
+            futures.append(executor.submit(self._call, func, gateways[1]))
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if not is_retryable(error):
+                    raise error
+        if len(gateways) == len(futures):
+            raise error
+        return self.call(func, gateways[len(futures) :])
+
+    def deferred_call(self, func, hedge=False):
+        """
+        Deferred version of call and hedged: func(gateway) returns a Deferred, the first success is returned.
+        """
+        from twisted.internet import reactor
+
+        gateways = self.ordered()
+        result = defer.Deferred()
+        state = {'next': 0, 'running': 0, 'error': None}
+
+        def _start():
+            gateway = gateways[state['next']]
+            state['next'] += 1
+            state['running'] += 1
+            start = time.perf_counter()
+            dfd = defer.maybeDeferred(func, gateway)
+            dfd.addCallbacks(_succeeded, _failed, (gateway, start), errbackArgs=(gateway,))
+
+        def _succeeded(value, gateway, start):
+            state['running'] -= 1
+            self.record_success(gateway, time.perf_counter() - start)
+            if not result.called:
+                result.callback(value)
+
+        def _failed(failure, gateway):
+            state['running'] -= 1
+            retryable = is_retryable(failure.value)
+            if retryable:
+                self.record_failure(gateway, failure.value)
+            if result.called:
+                return
+            if not retryable:
+                result.errback(failure)
+                return
+            state['error'] = failure
+            if state['running']:
+                return
+            if state['next'] < len(gateways):
+                self._inc_stats('arweave/gateway/failovers')
+                _start()
+            else:
+                result.errback(state['error'])
+
+        def _hedge():
+            if not result.called and state['running'] and state['next'] < len(gateways):
+                self._inc_stats('arweave/gateway/hedged')
+                _start()
+
+        def _cancel_hedge(value, call):
+            if call.active():
+                call.cancel()
+            return value
+
+        _start()
+        if hedge and self.hedge_delay and not result.called:
+            result.addBoth(_cancel_hedge, reactor.callLater(self.hedge_delay, _hedge))
+        return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _call(self, func, gateway):
+        start = time.perf_counter()
+        try:
+            result = func(gateway.peer)
+        except Exception as exc:
+            if is_retryable(exc):
+                self.record_failure(gateway, exc)
+            raise
+        self.record_success(gateway, time.perf_counter() - start)
+        return result
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(2 * len(self.gateways), thread_name_prefix='arweave-hedge')
+            return self._executor
+
+    def _inc_stats(self, key, count=1):
+        if self.metrics is not None:
+            self.metrics.inc(key, count)
@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from twisted.internet import defer
+
+
+class ImageProcessor:
+    """
+    Decodes, converts and thumbnails images in worker threads, Pillow releases the GIL while it decodes,
+    resizes and encodes so the reactor keeps running and images are processed on all cores. Every job
+    reserves its estimated memory first and waits while the images being processed would need more than
+    max_memory bytes; an image larger than max_memory is processed on its own.
+    """
+
+    metrics = None
+
+    def __init__(self, max_workers=None, max_memory=256 * 1024 * 1024):
+        self.executor = ThreadPoolExecutor(max_workers or os.cpu_count(), thread_name_prefix='arweave-images')
+        self.max_memory = max_memory
+        self.reserved = 0
+        self._waiting = []
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_workers=settings.getint('ARWEAVE_IMAGES_POOL_SIZE', 0) or None,
+            max_memory=settings.getint('ARWEAVE_IMAGES_MAX_MEMORY', 256 * 1024 * 1024),
+        )
+
+    def submit(self, size, func, *args, **kwargs):
+        """Call func in a worker thread once size bytes are free, returns a Deferred with its result."""
+
+        def _process(_):
+            dfd = self._run(func, *args, **kwargs)
+            if self.metrics is not None:
+                self.metrics.timed_deferred('images', dfd)
+            return dfd
+
+        def _release(result):
+            self._release(size)
+            return result
+
+        dfd = self._reserve(size)
+        dfd.addCallback(_process)
+        return dfd.addBoth(_release)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def _run(self, func, *args, **kwargs):
+        from twisted.internet import reactor
+
+        dfd = defer.Deferred()
+
+        def _done(future):
+            if future.exception() is not None:
+                reactor.callFromThread(dfd.errback, future.exception())
+            else:
+                reactor.callFromThread(dfd.callback, future.result())
+
+        self.executor.submit(func, *args, **kwargs).add_done_callback(_done)
+        return dfd
+
+    def _fits(self, size):
+        return self.reserved == 0 or self.reserved + size <= self.max_memory
+
+    def _reserve(self, size):
+        if not self._waiting and self._fits(size):
+            self.reserved += size
+            return defer.succeed(None)
+        if self.metrics is not None:
+            self.metrics.inc('arweave/images/memory_waits')
+        dfd = defer.Deferred()
+        self._waiting.append((size, dfd))
+        return dfd
+
+    def _release(self, size):
+        self.reserved -= size
+        while self._waiting and self._fits(self._waiting[0][0]):
+            size, dfd = self._waiting.pop(0)
+            self.reserved += size
+            dfd.callback(None)
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class HashIndex:
+    """
+    Persistent mapping of content hash to Arweave transaction id, and of media store path (the request URL
+    fingerprint of the pipelines) to the transaction id uploaded for it, so media already archived is skipped
+    before it is downloaded.
+    Backed by a SQLite database so it survives between crawls and can be shared by several processes.
+    """
+
+    def __init__(self, path, ttl=0, warmup=False):
+        self.path = path
+        self.ttl = ttl
+        self.warmup = warmup
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS hashes (hash TEXT PRIMARY KEY, tx_id TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS paths '
+                '(path TEXT PRIMARY KEY, tx_id TEXT NOT NULL, hash TEXT, created REAL NOT NULL)'
+            )
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get('ARWEAVE_INDEX_PATH')
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl=settings.getint('ARWEAVE_INDEX_TTL', 0),
+            warmup=settings.getbool('ARWEAVE_INDEX_WARMUP', False),
+        )
+
+    def get(self, hash):
+        """Return the transaction id stored for hash, or None if it is unknown or older than the TTL."""
+        with self._lock:
+            row = self._connection.execute('SELECT tx_id, created FROM hashes WHERE hash = ?', (hash,)).fetchone()
+        if row is None:
+            return None
+        tx_id, created = row
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        return tx_id
+
+    def set(self, hash, tx_id):
+        self.update({hash: tx_id})
+
+    def update(self, mapping):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO hashes (hash, tx_id, created) VALUES (?, ?, ?)',
+                [(hash, tx_id, now) for hash, tx_id in mapping.items()],
+            )
+
+    def delete(self, hash):
+        """Forget hash and the media paths stored with it."""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM hashes WHERE hash = ?', (hash,))
+            self._connection.execute('DELETE FROM paths WHERE hash = ?', (hash,))
+
+    def get_path(self, path):
+        """Return (tx_id, created) stored for a media path, or None. Expiry is left to the pipeline's EXPIRES."""
+        with self._lock:
+            return self._connection.execute('SELECT tx_id, created FROM paths WHERE path = ?', (path,)).fetchone()
+
+    def set_path(self, path, tx_id, hash=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO paths (path, tx_id, hash, created) VALUES (?, ?, ?, ?)',
+                (path, tx_id, hash, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
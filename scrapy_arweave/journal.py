@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+PENDING = 'pending'
+SIGNED = 'signed'
+SUBMITTED = 'submitted'
+CONFIRMED = 'confirmed'
+
+COMPLETED = (SUBMITTED, CONFIRMED)
+
+
+class UploadJournal:
+    """
+    Append-only log of upload states (pending, signed, submitted, confirmed) keyed by content hash.
+    Each change is one JSON line flushed right away, the log is replayed when the journal is opened
+    so a restarted crawl knows which files were already uploaded and which were interrupted.
+    Once the log has far more lines than hashes, it is rewritten with one line per hash.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.paths = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.lines = self._replay()
+        if self._needs_compaction():
+            self._compact()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get('ARWEAVE_JOURNAL_PATH')
+        if not path:
+            return None
+        return cls(path)
+
+    def record(self, hash, state, path=None, id=None):
+        if not hash:
+            return
+        change = {'state': state}
+        if path:
+            change['path'] = str(path)
+        if id:
+            change['id'] = id
+        with self._lock:
+            entry = self.entries.get(hash, {})
+            if all(entry.get(key) == value for key, value in change.items()):
+                return
+            self._apply(hash, change)
+            line = json.dumps({'hash': hash, 'time': time.time(), **change})
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.lines += 1
+            if self._needs_compaction():
+                self._file.close()
+                self._compact()
+                self._file = open(self.path, 'a', encoding='utf-8')
+
+    def get(self, hash):
+        """Return the transaction id of hash if it was submitted or confirmed, otherwise None."""
+        entry = self.entries.get(hash)
+        if entry is not None and entry['state'] in COMPLETED:
+            return entry.get('id')
+
+    def get_path(self, path):
+        """Return (hash, tx id) of the completed upload of the file at path, or None."""
+        hash = self.paths.get(str(path))
+        tx_id = self.get(hash) if hash else None
+        if tx_id:
+            return hash, tx_id
+
+    def pending(self):
+        """Entries that were started or signed but never submitted."""
+        return [dict(entry, hash=hash) for hash, entry in self.entries.items() if entry['state'] not in COMPLETED]
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _apply(self, hash, change):
+        entry = self.entries.setdefault(hash, {})
+        entry.update(change)
+        if 'path' in change:
+            self.paths[change['path']] = hash
+
+    def _replay(self):
+        lines = 0
+        if not os.path.exists(self.path):
+            return lines
+        offset = 0
+        torn = None
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # The last line was cut short by a crash.
+                    torn = offset
+                    break
+                offset += len(line)
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    continue
+                lines += 1
+                hash = change.pop('hash')
+                change.pop('time', None)
+                self._apply(hash, change)
+        if torn is not None:
+            # Drop the torn line, otherwise the next record would be appended to it and lost on replay.
+            with open(self.path, 'r+b') as f:
+                f.truncate(torn)
+        return lines
+
+    def _needs_compaction(self):
+        return self.lines > 2 * len(self.entries) + 1000
+
+    def _compact(self):
+        temp_path = self.path + '.tmp'
+        now = time.time()
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for hash, entry in self.entries.items():
+                f.write(json.dumps({'hash': hash, 'time': now, **entry}) + '\n')
+        os.replace(temp_path, self.path)
+        self.lines = len(self.entries)
@@ -0,0 +1,59 @@
+from twisted.internet import defer
+
+
+class BatchedHashLookup:
+    """
+    Collects concurrent hash lookups for a short window, or until max_size hashes are waiting,
+    and resolves them with a single GraphQL query through ArweaveStorageClient.deferred_get_tx_ids.
+    """
+
+    def __init__(self, client, max_size=100, window=0.05):
+        self.client = client
+        self.max_size = max_size
+        self.window = window
+        self._pending = {}
+        self._delayed_flush = None
+
+    @classmethod
+    def from_settings(cls, client, settings):
+        max_size = settings.getint('ARWEAVE_LOOKUP_BATCH_SIZE', 100)
+        if max_size <= 1:
+            return None
+        return cls(client, max_size=max_size, window=settings.getfloat('ARWEAVE_LOOKUP_BATCH_WINDOW', 0.05))
+
+    def lookup(self, hash):
+        """Return a Deferred that fires with the transaction id of hash or fails with KeyError."""
+        from twisted.internet import reactor
+
+        dfd = defer.Deferred()
+        self._pending.setdefault(hash, []).append(dfd)
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._delayed_flush is None:
+            self._delayed_flush = reactor.callLater(self.window, self.flush)
+        return dfd
+
+    def flush(self):
+        if self._delayed_flush is not None and self._delayed_flush.active():
+            self._delayed_flush.cancel()
+        self._delayed_flush = None
+
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return defer.succeed(None)
+        dfd = self.client.deferred_get_tx_ids(list(pending))
+        dfd.addCallbacks(self._resolve, self._fail, callbackArgs=(pending,), errbackArgs=(pending,))
+        return dfd
+
+    def _resolve(self, found, pending):
+        for hash, waiters in pending.items():
+            for dfd in waiters:
+                if hash in found:
+                    dfd.callback(found[hash])
+                else:
+                    dfd.errback(KeyError(hash))
+
+    def _fail(self, failure, pending):
+        for waiters in pending.values():
+            for dfd in waiters:
+                dfd.errback(failure)
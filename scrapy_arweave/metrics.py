@@ -0,0 +1,81 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from scrapy.utils.misc import load_object
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+
+class Metrics:
+    """
+    Records counters, byte counts, latency histograms and error classes of the upload path in the Scrapy stats
+    collector under arweave/<stage>/..., and passes every measurement to hook(kind, name, value) when one is set,
+    kind being 'count' or 'timing'.
+    """
+
+    def __init__(self, stats=None, hook=None, buckets=LATENCY_BUCKETS):
+        self.stats = stats
+        self.hook = hook
+        self.buckets = buckets
+
+    @classmethod
+    def from_settings(cls, settings):
+        hook = settings.get('ARWEAVE_METRICS_HOOK')
+        return cls(hook=load_object(hook) if hook else None)
+
+    def inc(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+        self._export('count', key, count)
+
+    def add_bytes(self, stage, size):
+        self.inc('arweave/%s/bytes' % stage, size)
+
+    def error(self, stage, exc):
+        self.inc('arweave/%s/errors/%s' % (stage, type(exc).__name__))
+
+    def observe(self, stage, seconds):
+        if self.stats is not None:
+            prefix = 'arweave/%s/' % stage
+            self.stats.inc_value(prefix + 'count')
+            self.stats.inc_value(prefix + 'time', seconds)
+            self.stats.max_value(prefix + 'time_max', seconds)
+            bucket = next((bucket for bucket in self.buckets if seconds <= bucket), None)
+            self.stats.inc_value(prefix + ('latency/le_%ss' % bucket if bucket is not None else 'latency/inf'))
+        self._export('timing', stage, seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """Time the block as stage, exceptions are counted by class and raised again."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            self.error(stage, exc)
+            raise
+        self.observe(stage, time.perf_counter() - start)
+
+    def timed_deferred(self, stage, dfd):
+        """Time a Deferred from now until it fires, like timed."""
+        start = time.perf_counter()
+
+        def _done(result):
+            self.observe(stage, time.perf_counter() - start)
+            return result
+
+        def _failed(failure):
+            self.error(stage, failure.value)
+            return failure
+
+        return dfd.addCallbacks(_done, _failed)
+
+    def _export(self, kind, name, value):
+        if self.hook is None:
+            return
+        try:
+            self.hook(kind, name, value)
+        except Exception:
+            logger.exception('Arweave metrics hook failed')
@@ -2,6 +2,7 @@ import functools
 import hashlib
 import logging
 import os
+import time
 import warnings
 from contextlib import suppress
 from io import BytesIO
@@ -20,32 +21,183 @@ from scrapy.utils.python import get_func_args, to_bytes
 from scrapy.utils.request import referer_str
 from twisted.internet import defer, threads
 
+from . import signals
+from .imaging import ImageProcessor
+from .routing import BUNDLER
+
 logger = logging.getLogger(__name__)
 
 
 class ArweaveFilesStore(FSFilesStore):
     WALLET_JWK = ""
     GATEWAY_URL = ""
+    SETTINGS = None
+
+    signals = None
 
     def __init__(self, basedir):
-        from .client import ArweaveStorageClient
+        from .aggregator import BundleAggregator
+        from .client import get_client
+        from .confirmations import ConfirmationTracker
+        from .lookup import BatchedHashLookup
+        from .scheduler import UploadScheduler
 
         super().__init__(basedir)
-        self.client = ArweaveStorageClient(self.WALLET_JWK, self.GATEWAY_URL)
+        settings = self.SETTINGS or Settings()
+        self.client = get_client(settings, wallet_jwk=self.WALLET_JWK, gateway_url=self.GATEWAY_URL)
+        self.lookup = BatchedHashLookup.from_settings(self.client, settings)
+        self.scheduler = UploadScheduler.from_settings(settings)
+        self.aggregator = BundleAggregator.from_settings(self.client, settings, scheduler=self.scheduler)
+        self.confirmations = ConfirmationTracker.from_settings(self.client, settings, reupload=self._reupload)
+        self.diskless = settings.getbool('ARWEAVE_FILES_DISKLESS', False)
+        self.optimistic = settings.getbool('ARWEAVE_OPTIMISTIC', False)
+        self.background = set()
 
     def persist_file(self, path, buf, info, meta=None, headers=None):
         absolute_path = self._get_filesystem_path(path)
-        super().persist_file(path, buf, info, meta, headers)
-        file_hash = self.client.calculate_hash(absolute_path)
-        dfd = threads.deferToThread(self.client.upload, absolute_path, buf.getvalue(), file_hash)
+        # A BytesIO that is not written to again shares its buffer with getvalue(), nothing is copied
+        # from the response body to the upload.
+        data = buf.getvalue()
+        file_hash = self.client.calculate_buffer_hash(data)
+        if not self.diskless:
+            super().persist_file(path, buf, info, meta, headers)
+            dfd = self._upload(absolute_path, data, file_hash)
+        else:
+            # Nothing is kept on local disk, so stat_file only finds uploaded files through the index;
+            # look the hash up after the download instead.
+            dfd = self._lookup(file_hash)
+            dfd.addErrback(lambda _: self._upload(absolute_path, data, file_hash))
+        return dfd.addCallback(self._remember_path, path, file_hash)
+
+    def _remember_path(self, tx_id, path, file_hash=None):
+        """Record the tx id stored for path in the index, so the next crawl skips its download."""
+        if self.client.index is not None:
+            self.client.index.set_path(path, tx_id, file_hash)
+        return tx_id
+
+    def _upload(self, absolute_path, data, file_hash):
+        dfd = self._schedule_upload(absolute_path, data, file_hash)
+        if self.confirmations is not None:
+            dfd.addCallback(self.confirmations.track, file_hash, absolute_path)
         return dfd
 
+    def _schedule_upload(self, absolute_path, data, file_hash):
+        if self.aggregator is not None and self.aggregator.accepts(len(data)):
+            dfd = self.client.deferred_create_dataitem(absolute_path, data, file_hash)
+            if self.optimistic:
+                send = functools.partial(self.aggregator.add, hash=file_hash)
+                return dfd.addCallback(self._submit_in_background, file_hash, send)
+            return dfd.addCallback(self.aggregator.add, file_hash)
+        endpoint = self.client.router.choose(len(data))
+        if self.optimistic and endpoint == BUNDLER:
+            dfd = self.client.deferred_create_dataitem(absolute_path, data, file_hash)
+            send = functools.partial(
+                self.scheduler.submit, BUNDLER, self.client.deferred_submit_dataitem, hash=file_hash
+            )
+            return dfd.addCallback(self._submit_in_background, file_hash, send)
+        return self.scheduler.submit(endpoint, self.client.deferred_upload, absolute_path, data, file_hash)
+
+    def _submit_in_background(self, dataitem, file_hash, send):
+        """
+        Optimistic mode: the id of a signed DataItem is known before it is sent, so return it right away
+        and report the submission through stats and signals once it is done.
+        """
+        tx_id = dataitem.header.id
+        dfd = send(dataitem)
+        self.background.add(dfd)
+        dfd.addCallbacks(self._submitted, self._submit_failed, (file_hash, tx_id), errbackArgs=(file_hash, tx_id))
+        dfd.addBoth(lambda _: self.background.discard(dfd))
+        self._inc_stats('arweave/optimistic/signed')
+        return tx_id
+
+    def _submitted(self, submitted_id, file_hash, tx_id):
+        if submitted_id != tx_id:
+            logger.warning('Bundler answered with id %s for DataItem %s', submitted_id, tx_id)
+        self._inc_stats('arweave/optimistic/submitted')
+        self._send_signal(signals.upload_submitted, hash=file_hash, tx_id=tx_id)
+
+    def _submit_failed(self, failure, file_hash, tx_id):
+        logger.error('Upload of DataItem %s failed after its permalink was returned: %s', tx_id, failure.value)
+        # Its path was stored with the signed id, the next crawl downloads and uploads the file again.
+        self.client.forget(file_hash)
+        self._inc_stats('arweave/optimistic/failed')
+        self._send_signal(signals.upload_failed, hash=file_hash, tx_id=tx_id, failure=failure)
+
+    def _send_signal(self, signal, **kwargs):
+        if self.signals is not None:
+            self.signals.send_catch_log(signal, **kwargs)
+
+    def _inc_stats(self, key, count=1):
+        self.client.metrics.inc(key, count)
+
+    def _lookup(self, file_hash):
+        tx_id = self.client.journal.get(file_hash) if self.client.journal is not None else None
+        if tx_id:
+            return defer.succeed(tx_id)
+        if self.lookup is not None:
+            return self.lookup.lookup(file_hash)
+        return self.client.deferred_get_tx_id(file_hash)
+
     def stat_file(self, path, info):
+        indexed = self.client.index.get_path(path) if self.client.index is not None else None
+        if indexed:
+            # The pipeline compares last_modified with FILES_EXPIRES / IMAGES_EXPIRES.
+            return {"tx_id": indexed[0], "last_modified": indexed[1]}
+        if self.diskless:
+            return {}
         absolute_path = self._get_filesystem_path(path)
+        if not os.path.isfile(absolute_path):
+            return {}
+        completed = self.client.journal.get_path(absolute_path) if self.client.journal is not None else None
+        if completed:
+            return {"tx_id": completed[1]}
         file_hash = self.client.calculate_hash(absolute_path)
-        dfd = threads.deferToThread(self.client.get_tx_id, file_hash)
+        dfd = self._lookup(file_hash)
+        dfd.addCallback(self._remember_path, path, file_hash)
         return dfd.addCallback(lambda tx_id: {"tx_id": tx_id})
 
+    @defer.inlineCallbacks
+    def resume(self):
+        """
+        Upload again the files the journal shows as started but never submitted, if they are still on disk
+        with the same content. Returns the number of uploads started.
+        """
+        count = 0
+        journal = self.client.journal
+        for entry in journal.pending() if journal is not None else []:
+            path = entry.get('path')
+            if not path or not os.path.isfile(path):
+                continue
+            started = yield self.scheduler.run_when_room(self._resume_upload, path, entry['hash'])
+            if started:
+                count += 1
+        return count
+
+    @defer.inlineCallbacks
+    def _resume_upload(self, path, file_hash):
+        data = yield threads.deferToThread(_read_file, path)
+        if self.client.calculate_buffer_hash(data) != file_hash:
+            return False
+        dfd = self._upload(path, data, file_hash)
+        dfd.addErrback(lambda f: logger.warning('Resumed upload of %s failed: %s', path, f.value))
+        return True
+
+    @defer.inlineCallbacks
+    def _reupload(self, file_hash, path):
+        """Upload again a file whose upload never landed, if it is still on disk with the same content."""
+        if not path or not os.path.isfile(path):
+            return None
+        data = yield threads.deferToThread(_read_file, path)
+        if self.client.calculate_buffer_hash(data) != file_hash:
+            return None
+        tx_id = yield self._upload(path, data, file_hash)
+        return tx_id
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
 
 class FilesPipeline(ParentFilesPipeline):
     """Custom Files Abstract pipeline that implement the file downloading"""
@@ -60,6 +212,7 @@ class FilesPipeline(ParentFilesPipeline):
         arweave_store = cls.STORE_SCHEMES['ar']
         arweave_store.WALLET_JWK = settings['WALLET_JWK']
         arweave_store.GATEWAY_URL = settings["GATEWAY_URL"] or "https://arweave.net"
+        arweave_store.SETTINGS = settings
 
     @classmethod
     def from_settings(cls, settings):
@@ -67,6 +220,75 @@ class FilesPipeline(ParentFilesPipeline):
         store_uri = settings['FILES_STORE']
         return cls(store_uri, settings=settings)
 
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.store.client.stats = spider.crawler.stats
+        self.store.scheduler.metrics = self.store.client.metrics
+        self.store.signals = spider.crawler.signals
+        if self.store.confirmations is not None:
+            self.store.confirmations.signals = spider.crawler.signals
+            self.store.confirmations.start()
+        if self.store.client.journal is not None:
+
+            def _resumed(count):
+                if count:
+                    logger.info(
+                        'Resumed %(count)d interrupted Arweave uploads', {'count': count}, extra={'spider': spider}
+                    )
+
+            dfd = self.store.resume()
+            dfd.addCallback(_resumed)
+            dfd.addErrback(
+                lambda f: logger.error(
+                    self.__class__.__name__ + '.store.resume',
+                    exc_info=failure_to_exc_info(f),
+                    extra={'spider': spider},
+                )
+            )
+        if len(self.store.client.wallets) > 1:
+            # Known balances let L1 transactions skip wallets that ran out of funds.
+            dfd = threads.deferToThread(self.store.client.wallets.refresh_balances)
+            dfd.addErrback(
+                lambda f: logger.warning(
+                    'Could not fetch the Arweave wallet balances: %(error)s',
+                    {'error': f.getErrorMessage()},
+                    extra={'spider': spider},
+                )
+            )
+        index = self.store.client.index
+        if index is not None and index.warmup:
+            dfd = threads.deferToThread(self.store.client.warm_up_index)
+            dfd.addCallback(
+                lambda count: logger.info(
+                    'Loaded %(count)d file hashes into the Arweave index', {'count': count}, extra={'spider': spider}
+                )
+            )
+            dfd.addErrback(
+                lambda f: logger.error(
+                    self.__class__.__name__ + '.store.client.warm_up_index',
+                    exc_info=failure_to_exc_info(f),
+                    extra={'spider': spider},
+                )
+            )
+            return dfd
+
+    def process_item(self, item, spider):
+        # Backpressure: media of new items is only requested while the upload queue has room.
+        return self.store.scheduler.run_when_room(super().process_item, item, spider)
+
+    def close_spider(self, spider):
+        from .client import release_client
+
+        dfd = defer.succeed(None)
+        if self.store.aggregator is not None:
+            dfd = self.store.aggregator.flush()
+        # Optimistic uploads still being sent keep the client open until they are done.
+        dfd.addBoth(lambda _: defer.DeferredList(list(self.store.background)))
+        if self.store.confirmations is not None:
+            # Stopped once those are done, so their ids are tracked and checked one last time.
+            dfd.addBoth(lambda _: self.store.confirmations.stop())
+        return dfd.addBoth(lambda _: release_client(self.store.client))
+
     def _get_store(self, uri):
         if os.path.isabs(uri):  # to support win32 paths like: C:\\some\dir
             scheme = "ar"
@@ -80,6 +302,12 @@ class FilesPipeline(ParentFilesPipeline):
             if not result:
                 return  # returning None force download
 
+            last_modified = result.get('last_modified', None)
+            if last_modified:
+                age_days = (time.time() - last_modified) / 60 / 60 / 24
+                if age_days > self.expires:
+                    return  # returning None force download
+
             referer = referer_str(request)
             logger.debug(
                 'File (uptodate): Downloaded %(medianame)s from %(request)s ' 'referred in <%(referer)s>',
@@ -138,8 +366,17 @@ class FilesPipeline(ParentFilesPipeline):
                 permalink = self.store.client.get_url(tx_id)
                 return {'url': request.url, 'tx_id': tx_id, "permalink": permalink}
 
+            def _onerror(failure):
+                logger.warning(
+                    'File (upload-error): Error uploading file from %(request)s referred in <%(referer)s>: %(errormsg)s',
+                    {'request': request, 'referer': referer, 'errormsg': failure.getErrorMessage()},
+                    extra={'spider': info.spider},
+                )
+                self.inc_stats(info.spider, 'upload-error')
+                raise FileException('upload-error')
+
             if dfd:
-                dfd.addCallbacks(_onsuccess, lambda _: None)
+                dfd.addCallbacks(_onsuccess, _onerror)
             return dfd
         except FileException as exc:
             logger.warning(
@@ -205,6 +442,8 @@ class ImagesPipeline(FilesPipeline):
         self.min_width = settings.getint(resolve('IMAGES_MIN_WIDTH'), self.MIN_WIDTH)
         self.min_height = settings.getint(resolve('IMAGES_MIN_HEIGHT'), self.MIN_HEIGHT)
         self.thumbs = settings.get(resolve('IMAGES_THUMBS'), self.THUMBS)
+        self.draft = settings.getbool('ARWEAVE_IMAGES_DRAFT', True)
+        self.image_processor = ImageProcessor.from_settings(settings)
 
         self._deprecated_convert_image = None
 
@@ -214,12 +453,55 @@ class ImagesPipeline(FilesPipeline):
         store_uri = settings['IMAGES_STORE']
         return cls(store_uri, settings=settings)
 
+    def open_spider(self, spider):
+        dfd = super().open_spider(spider)
+        self.image_processor.metrics = self.store.client.metrics
+        return dfd
+
+    def close_spider(self, spider):
+        dfd = super().close_spider(spider)
+        self.image_processor.close()
+        return dfd
+
     def file_downloaded(self, response, request, info, *, item=None):
         return self.image_downloaded(response, request, info, item=item)
 
     def image_downloaded(self, response, request, info, *, item=None):
+        # Only the header is read here, decoding and thumbnailing run in the image processor's threads.
+        image = self._Image.open(BytesIO(response.body))
+        width, height = image.size
+        if width < self.min_width or height < self.min_height:
+            raise ImageException("Image too small " f"({width}x{height} < " f"{self.min_width}x{self.min_height})")
+
+        # Decoded as RGBA at most, next to the original and the re-encoded JPEG.
+        size = width * height * 4 + 2 * len(response.body)
+        if type(self).get_images is not ImagesPipeline.get_images:
+            dfd = self.image_processor.submit(size, self._get_images, response, request, info, item=item)
+            return dfd.addCallback(self._persist_images, info)
+
+        # file_path and thumb_path may be overridden to use the item or spider state, so they run here on
+        # the reactor thread and only the conversion runs in the image processor's threads.
+        paths = self._image_paths(response, request, info, item)
+        dfd = self.image_processor.submit(size, self._get_converted_images, response)
+        dfd.addCallback(lambda images: [(path, image, buf) for path, (image, buf) in zip(paths, images)])
+        return dfd.addCallback(self._persist_images, info)
+
+    def _get_images(self, response, request, info, *, item=None):
+        return list(self.get_images(response, request, info, item=item))
+
+    def _get_converted_images(self, response):
+        return list(self._convert_images(response))
+
+    def _image_paths(self, response, request, info, item):
+        """The path of the image, then of each of its thumbnails."""
+        paths = [self.file_path(request, response=response, info=info, item=item)]
+        for thumb_id in self.thumbs:
+            paths.append(self.thumb_path(request, thumb_id, response=response, info=info, item=item))
+        return paths
+
+    def _persist_images(self, images, info):
         result = None
-        for path, image, buf in self.get_images(response, request, info, item=item):
+        for path, image, buf in images:
             buf.seek(0)
             width, height = image.size
             result = self.store.persist_file(
@@ -232,7 +514,12 @@ class ImagesPipeline(FilesPipeline):
         return result
 
     def get_images(self, response, request, info, *, item=None):
-        path = self.file_path(request, response=response, info=info, item=item)
+        paths = self._image_paths(response, request, info, item)
+        for path, (image, buf) in zip(paths, self._convert_images(response)):
+            yield path, image, buf
+
+    def _convert_images(self, response):
+        """Yield (image, buf) of the image, then of each of its thumbnails."""
         orig_image = self._Image.open(BytesIO(response.body))
 
         width, height = orig_image.size
@@ -252,15 +539,20 @@ class ImagesPipeline(FilesPipeline):
             image, buf = self.convert_image(orig_image)
         else:
             image, buf = self.convert_image(orig_image, response_body=BytesIO(response.body))
-        yield path, image, buf
+        yield image, buf
+
+        thumb_source = image
+        if self.draft and self.thumbs and orig_image.format == 'JPEG':
+            # Decode JPEGs once at the smallest DCT scale still covering the largest thumbnail,
+            # every thumbnail is then resized from that one decoded image.
+            thumb_source = self._Image.open(BytesIO(response.body))
+            thumb_source.draft('RGB', tuple(max(size[i] for size in self.thumbs.values()) for i in (0, 1)))
 
-        for thumb_id, size in self.thumbs.items():
-            thumb_path = self.thumb_path(request, thumb_id, response=response, info=info, item=item)
+        for size in self.thumbs.values():
             if self._deprecated_convert_image:
-                thumb_image, thumb_buf = self.convert_image(image, size)
+                yield self.convert_image(thumb_source, size)
             else:
-                thumb_image, thumb_buf = self.convert_image(image, size, buf)
-            yield thumb_path, thumb_image, thumb_buf
+                yield self.convert_image(thumb_source, size, buf)
 
     def convert_image(self, image, size=None, response_body=None):
         if response_body is None:
@@ -0,0 +1,69 @@
+import io
+import os
+import time
+from tempfile import NamedTemporaryFile
+
+
+class RollingFeedFile(io.RawIOBase):
+    """
+    Writable feed file made of consecutive parts.
+    Everything written goes to the current part, cut() hands it over and starts a new one,
+    so the parts joined in order are the whole feed.
+    """
+
+    def __init__(self, max_items=0, max_size=0, max_age=0):
+        self.max_items = max_items
+        self.max_size = max_size
+        self.max_age = max_age
+        self.part = None
+        self._new_part()
+
+    def _new_part(self):
+        self.part = NamedTemporaryFile(prefix='feed-')
+        self.items = 0
+        self.size = 0
+        self.started = time.monotonic()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        written = self.part.write(data)
+        self.size += written
+        return written
+
+    def flush(self):
+        if self.part is not None:
+            self.part.flush()
+
+    def close(self):
+        # Exporters and post-processing plugins close the file they write to, the current part is
+        # still needed by the storage afterwards.
+        self.flush()
+        super().close()
+
+    def item_written(self):
+        """Count an item and return True if the current part is due to be cut."""
+        self.items += 1
+        if self.max_items and self.items >= self.max_items:
+            return True
+        if self.max_size and self.size >= self.max_size:
+            return True
+        return bool(self.max_age and time.monotonic() - self.started >= self.max_age)
+
+    def cut(self, last=False):
+        """Return the current part, flushed and rewound, and continue writing to a new one unless it is the last."""
+        part = self.part
+        part.flush()
+        part.seek(0)
+        if last:
+            self.part = None
+        else:
+            self._new_part()
+        return part
+
+
+def part_name(file_name, index):
+    """Name of the part at index in the manifest of the feed file_name, e.g. items-00001.jsonl.gz"""
+    root, dot, ext = os.path.basename(file_name).partition('.')
+    return '%s-%05d%s%s' % (root or 'feed', index, dot, ext)
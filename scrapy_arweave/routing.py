@@ -0,0 +1,57 @@
+import threading
+import time
+
+from .scheduler import is_retryable
+
+BUNDLER = 'bundler'
+L1 = 'l1'
+
+
+class UploadRouter:
+    """
+    Decides upfront whether a payload is sent to the bundler as a DataItem or posted as an L1 transaction.
+    Payloads above max_bundler_size go to L1, and so does everything else for `cooldown` seconds
+    after the bundler failed `max_failures` times in a row.
+    A payload the bundler failed on is only sent to L1 instead when the bundler rejected it, is out of funds
+    or became unhealthy; throttling and short outages are retried against the bundler.
+    """
+
+    def __init__(self, max_bundler_size=25 * 1024 * 1024, max_failures=3, cooldown=60):
+        self.max_bundler_size = max_bundler_size
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.unhealthy_until = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_bundler_size=settings.getint('ARWEAVE_BUNDLER_MAX_SIZE', 25 * 1024 * 1024),
+            max_failures=settings.getint('ARWEAVE_BUNDLER_MAX_FAILURES', 3),
+            cooldown=settings.getfloat('ARWEAVE_BUNDLER_COOLDOWN', 60),
+        )
+
+    @property
+    def bundler_healthy(self):
+        return time.time() >= self.unhealthy_until
+
+    def choose(self, size):
+        if size > self.max_bundler_size or not self.bundler_healthy:
+            return L1
+        return BUNDLER
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                self.failures = 0
+                self.unhealthy_until = time.time() + self.cooldown
+
+    def falls_back(self, exc):
+        """True if a payload the bundler failed on with exc is sent as an L1 transaction instead."""
+        return not (is_retryable(exc) and self.bundler_healthy)
@@ -0,0 +1,180 @@
+import logging
+import random
+import time
+
+from twisted.internet import defer, task
+from twisted.internet.error import ConnectError, ConnectionLost
+from twisted.web._newclient import ResponseNeverReceived
+
+logger = logging.getLogger(__name__)
+
+RETRY_EXCEPTIONS = (
+    defer.TimeoutError,
+    ConnectError,
+    ConnectionLost,
+    ResponseNeverReceived,
+)
+
+
+def is_retryable(exc):
+    """True for throttling (429), server errors (5xx) and connection failures."""
+    import requests
+    from ar import ArweaveNetworkException
+
+    if isinstance(exc, ArweaveNetworkException):
+        status = exc.args[1] if len(exc.args) > 1 else 0
+        return status == 0 or status == 429 or status >= 500
+    return isinstance(exc, RETRY_EXCEPTIONS + (requests.ConnectionError, requests.Timeout))
+
+
+class _Endpoint:
+    def __init__(self, concurrency, rate):
+        self.semaphore = defer.DeferredSemaphore(concurrency)
+        self.interval = 1.0 / rate if rate else 0
+        self.next_start = 0
+
+    def acquire(self):
+        from twisted.internet import reactor
+
+        def _throttle(_):
+            now = time.monotonic()
+            delay = max(0, self.next_start - now)
+            self.next_start = max(now, self.next_start) + self.interval
+            return task.deferLater(reactor, delay, lambda: None) if delay else None
+
+        return self.semaphore.acquire().addCallback(_throttle)
+
+
+class UploadScheduler:
+    """
+    Runs uploads with at most `concurrency` in flight and `rate` started per second for every endpoint
+    (the bundler, L1 gateway...). Throttled, failing and dropped requests are retried with exponential
+    backoff and jitter. Pipelines wait for room before requesting more media while max_queue uploads
+    are queued or running, see run_when_room.
+    """
+
+    metrics = None
+
+    def __init__(
+        self, max_queue=100, concurrency=None, rate_limits=None, max_retries=5, retry_delay=1.0, max_retry_delay=60.0
+    ):
+        self.max_queue = max_queue
+        self.concurrency = concurrency or {}
+        self.rate_limits = rate_limits or {}
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.pending = 0
+        self.reserved = 0
+        self._endpoints = {}
+        self._room_waiters = []
+        self._waking = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_queue=settings.getint('ARWEAVE_UPLOAD_QUEUE_SIZE', 100),
+            concurrency=settings.getdict('ARWEAVE_UPLOAD_CONCURRENCY', {'bundler': 8, 'l1': 2}),
+            rate_limits=settings.getdict('ARWEAVE_UPLOAD_RATE_LIMITS', {}),
+            max_retries=settings.getint('ARWEAVE_UPLOAD_MAX_RETRIES', 5),
+            retry_delay=settings.getfloat('ARWEAVE_UPLOAD_RETRY_DELAY', 1.0),
+            max_retry_delay=settings.getfloat('ARWEAVE_UPLOAD_RETRY_MAX_DELAY', 60.0),
+        )
+
+    @property
+    def full(self):
+        return self.pending + self.reserved >= self.max_queue
+
+    def wait_for_room(self):
+        """Return a Deferred that fires once fewer than max_queue uploads are queued or running."""
+        return self.run_when_room(lambda: None)
+
+    def run_when_room(self, func, *args, **kwargs):
+        """
+        Call func, which may return a Deferred, once fewer than max_queue uploads are queued or running.
+        While the queue is full, callers are let through one free place at a time and hold it until func is done,
+        so the uploads they are about to submit count against the queue before they are queued.
+        """
+        if not self.full and not self._room_waiters:
+            return defer.maybeDeferred(func, *args, **kwargs)
+        dfd = defer.Deferred()
+        self._room_waiters.append(dfd)
+        dfd.addCallback(lambda _: func(*args, **kwargs))
+        return dfd.addBoth(self._release_room)
+
+    def submit(self, endpoint, func, *args, **kwargs):
+        """
+        Call func, which returns a Deferred, within the limits of endpoint and retry it on transient errors.
+        Returns a Deferred with the result of the last attempt.
+        """
+        self.pending += 1
+        self._inc_stats('arweave/upload/queued')
+        dfd = self._run(endpoint, func, args, kwargs, 0)
+        dfd.addBoth(self._finished)
+        return dfd
+
+    def _run(self, endpoint, func, args, kwargs, attempt):
+        slot = self._get_endpoint(endpoint)
+
+        def _call(_):
+            dfd = defer.maybeDeferred(func, *args, **kwargs)
+            if self.metrics is not None:
+                self.metrics.timed_deferred('upload/%s' % endpoint, dfd)
+            return dfd.addBoth(_release)
+
+        def _release(result):
+            slot.semaphore.release()
+            return result
+
+        dfd = slot.acquire()
+        dfd.addCallback(_call)
+        dfd.addErrback(self._retry, endpoint, func, args, kwargs, attempt)
+        return dfd
+
+    def _retry(self, failure, endpoint, func, args, kwargs, attempt):
+        from twisted.internet import reactor
+
+        if attempt >= self.max_retries or not is_retryable(failure.value):
+            self._inc_stats('arweave/upload/failed')
+            return failure
+        delay = min(self.max_retry_delay, self.retry_delay * 2**attempt)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        logger.info('Retrying %s upload in %.1fs: %s', endpoint, delay, failure.getErrorMessage())
+        self._inc_stats('arweave/upload/retries')
+        self._inc_stats('arweave/upload/retries/%s' % endpoint)
+        dfd = task.deferLater(reactor, delay, lambda: None)
+        dfd.addCallback(lambda _: self._run(endpoint, func, args, kwargs, attempt + 1))
+        return dfd
+
+    def _finished(self, result):
+        self.pending -= 1
+        self._wake_waiters()
+        return result
+
+    def _release_room(self, result):
+        self.reserved -= 1
+        self._wake_waiters()
+        return result
+
+    def _wake_waiters(self):
+        # A waiter done right away releases its place from within this loop, which then goes on.
+        if self._waking:
+            return
+        self._waking = True
+        try:
+            while self._room_waiters and not self.full:
+                self.reserved += 1
+                self._room_waiters.pop(0).callback(None)
+        finally:
+            self._waking = False
+
+    def _get_endpoint(self, endpoint):
+        if endpoint not in self._endpoints:
+            concurrency = int(self.concurrency.get(endpoint, 8))
+            rate = float(self.rate_limits.get(endpoint, 0))
+            self._endpoints[endpoint] = _Endpoint(concurrency, rate)
+        return self._endpoints[endpoint]
+
+    def _inc_stats(self, key, count=1):
+        if self.metrics is not None:
+            self.metrics.inc(key, count)
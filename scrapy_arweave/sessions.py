@@ -0,0 +1,65 @@
+import threading
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class SharedSession:
+    """
+    Keep-alive session shared by the bundler, gateway and GraphQL clients of the process.
+    The requests session behind it is only created, and requests imported, when it first sends something.
+    pyarweave clients close their session when they are garbage collected, so close() keeps the pool open.
+    """
+
+    def __init__(self, pool_size=64, keep_alive=True, retries=5):
+        self._options = (pool_size, keep_alive, retries)
+        self._session = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._get_session(), name)
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        if self._session is not None:
+            self._session.close()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = _new_session(*self._options)
+        return self._session
+
+
+def get_session(pool_size=64, keep_alive=True, retries=5):
+    """Return the process-wide session for these options, creating it on first use."""
+    key = (pool_size, keep_alive, retries)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = SharedSession(pool_size, keep_alive, retries)
+        return _sessions[key]
+
+
+def session_from_settings(settings):
+    return get_session(
+        pool_size=settings.getint('ARWEAVE_HTTP_POOL_SIZE', 64),
+        keep_alive=settings.getbool('ARWEAVE_HTTP_KEEPALIVE', True),
+        retries=settings.getint('ARWEAVE_HTTP_RETRIES', 5),
+    )
+
+
+def _new_session(pool_size, keep_alive, retries):
+    import requests
+    from requests.adapters import HTTPAdapter, Retry
+
+    session = requests.Session()
+    max_retries = Retry(total=retries, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
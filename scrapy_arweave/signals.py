@@ -0,0 +1,10 @@
+"""
+Signals sent through the crawler's signal manager when uploads finish in the background,
+see ARWEAVE_OPTIMISTIC, and when ARWEAVE_CONFIRM_INTERVAL checks find them indexed or missing.
+Handlers receive the hash and tx_id keyword arguments, plus failure for upload_failed.
+"""
+
+upload_submitted = object()
+upload_failed = object()
+upload_confirmed = object()
+upload_missing = object()
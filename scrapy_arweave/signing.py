@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from twisted.internet import defer
+
+_keys = []
+
+
+def _init_worker(jwks):
+    # The wallet keys are parsed once per worker process.
+    from ar import Wallet
+
+    global _keys
+    _keys = [Wallet.from_data(jwk_data).rsa for jwk_data in jwks]
+
+
+def sign_dataitem(rsa, data, tags):
+    from ar import ANS104DataItemHeader, DataItem
+    from ar.utils import create_tag
+
+    header = ANS104DataItemHeader(tags=[create_tag(name, value, True) for name, value in tags])
+    dataitem = DataItem(data=data, header=header)
+    dataitem.sign(rsa)
+    return dataitem
+
+
+def _sign_in_worker(data, tags, key=0):
+    # Only the header travels back, the caller keeps its own copy of the data.
+    return sign_dataitem(_keys[key], data, tags).header
+
+
+class SigningPool:
+    """
+    Signs DataItems in worker processes so RSA signing and deep hashing of payloads
+    are not limited to the one core holding the GIL. jwks lists the wallets, key picks one of them by index.
+    """
+
+    def __init__(self, jwks, max_workers):
+        if isinstance(jwks, dict):
+            jwks = [jwks]
+        jwks = [dict(jwk_data) for jwk_data in jwks]
+        self.executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(jwks,))
+
+    def sign(self, data, tags, key=0):
+        """Sign in a worker and wait for the DataItem, for callers that are already off the reactor thread."""
+        from ar import DataItem
+
+        header = self.executor.submit(_sign_in_worker, bytes(data), tags, key).result()
+        return DataItem(header=header, data=data)
+
+    def deferred_sign(self, data, tags, key=0):
+        from ar import DataItem
+        from twisted.internet import reactor
+
+        dfd = defer.Deferred()
+
+        def _done(future):
+            if future.exception() is not None:
+                reactor.callFromThread(dfd.errback, future.exception())
+            else:
+                reactor.callFromThread(dfd.callback, DataItem(header=future.result(), data=data))
+
+        self.executor.submit(_sign_in_worker, bytes(data), tags, key).add_done_callback(_done)
+        return dfd
+
+    def close(self):
+        self.executor.shutdown(wait=False)
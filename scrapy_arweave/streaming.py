@@ -0,0 +1,148 @@
+import hashlib
+import io
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _sha384(data):
+    return hashlib.sha384(data).digest()
+
+
+def sign_dataitem_header(rsa, file, size, tags, chunk_size=CHUNK_SIZE):
+    """
+    Sign a DataItem whose data is read from file in chunk_size pieces instead of being held in memory.
+    Returns the signed header; the DataItem bytes are header.tobytes() followed by the file contents.
+    """
+    from ar import ANS104DataItemHeader
+    from ar.utils import create_tag
+    from ar.utils.deep_hash import deep_hash
+
+    header = ANS104DataItemHeader(tags=[create_tag(name, value, True) for name, value in tags])
+    header.raw_owner = header.signer.raw_owner(rsa)
+
+    # Same deep hash as DataItem.get_raw_signature_data, with the data blob hashed incrementally.
+    items = [
+        b'dataitem',
+        b'1',
+        str(header.signature_type).encode(),
+        header.raw_owner,
+        header.raw_target,
+        header.raw_anchor,
+        header.raw_tags,
+    ]
+    acc = _sha384(b'list' + str(len(items) + 1).encode())
+    for item in items:
+        acc = _sha384(acc + deep_hash(item))
+
+    data_hash = hashlib.sha384()
+    file.seek(0)
+    for data in iter(lambda: file.read(chunk_size), b''):
+        data_hash.update(data)
+    blob_hash = _sha384(_sha384(b'blob' + str(size).encode()) + data_hash.digest())
+    acc = _sha384(acc + blob_hash)
+
+    header.raw_signature = header.signer.sign(rsa, acc)
+    return header
+
+
+class _SeekableReader(io.RawIOBase):
+    position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += len(self)
+        self.position = max(0, min(offset, len(self)))
+        return self.position
+
+
+class BufferReader(_SeekableReader):
+    """Read-only, seekable file over a bytes-like object; reads copy only the requested slice."""
+
+    def __init__(self, data):
+        self.view = memoryview(data).cast('B')
+
+    def __len__(self):
+        return len(self.view)
+
+    def read(self, size=-1):
+        end = len(self) if size is None or size < 0 else self.position + size
+        data = bytes(self.view[self.position : end])
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.view[self.position : self.position + len(buffer)]
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class DataItemReader(_SeekableReader):
+    """Read-only, seekable view of a signed DataItem made of its header bytes followed by a file."""
+
+    def __init__(self, header_bytes, file, size):
+        self.header_bytes = header_bytes
+        self.file = file
+        self.size = size
+
+    @classmethod
+    def from_dataitem(cls, dataitem):
+        """Read a DataItem held in memory without serializing it into one more copy of its data."""
+        data = BufferReader(dataitem.data)
+        return cls(dataitem.header.tobytes(), data, len(data))
+
+    def __len__(self):
+        return len(self.header_bytes) + self.size
+
+    def readinto(self, buffer):
+        header_size = len(self.header_bytes)
+        if self.position < header_size:
+            data = self.header_bytes[self.position : self.position + len(buffer)]
+        else:
+            self.file.seek(self.position - header_size)
+            data = self.file.read(len(buffer))
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def serialize_dataitem(dataitem, buffer=None, offset=0):
+    """
+    Write the DataItem bytes into buffer at offset, or into a new buffer of the exact size.
+    Returns the buffer.
+    """
+    header = dataitem.header.tobytes()
+    data = memoryview(dataitem.data).cast('B')
+    size = len(header) + len(data)
+    if buffer is None:
+        buffer = bytearray(size)
+    view = memoryview(buffer)
+    view[offset : offset + len(header)] = header
+    view[offset + len(header) : offset + size] = data
+    return buffer
+
+
+def serialize_bundle(dataitems):
+    """Serialize an ANS-104 bundle into one preallocated buffer, without a temporary copy of every DataItem."""
+    from ar import Bundle
+
+    header = Bundle(dataitems).header.tobytes()
+    buffer = bytearray(len(header) + sum(dataitem.get_len_bytes() for dataitem in dataitems))
+    buffer[: len(header)] = header
+    offset = len(header)
+    for dataitem in dataitems:
+        serialize_dataitem(dataitem, buffer, offset)
+        offset += dataitem.get_len_bytes()
+    return buffer
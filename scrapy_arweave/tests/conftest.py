@@ -0,0 +1,11 @@
+import json
+
+import pytest
+from ar import Wallet
+
+
+@pytest.fixture(scope="session")
+def wallet_jwk(tmp_path_factory):
+    path = tmp_path_factory.mktemp("wallet") / "jwk.json"
+    path.write_text(json.dumps(Wallet.generate().jwk_data))
+    return str(path)
@@ -0,0 +1,36 @@
+from ar import DataItem
+from twisted.internet import defer
+
+from ..aggregator import BundleAggregator
+
+
+class FakeClient:
+    def __init__(self):
+        self.bundles = []
+
+    def deferred_upload_bundle(self, entries):
+        self.bundles.append([hash for _, hash in entries])
+        return defer.succeed("bundle-%d" % len(self.bundles))
+
+
+def test_flush_on_item_count():
+    client = FakeClient()
+    bundler = BundleAggregator(client, max_items=2)
+
+    ids = []
+    first, second = DataItem(data=b'a'), DataItem(data=b'b')
+    first.header.raw_signature, second.header.raw_signature = b'1' * 512, b'2' * 512
+    bundler.add(first, "hash-a").addCallback(ids.append)
+    assert client.bundles == []
+    bundler.add(second, "hash-b").addCallback(ids.append)
+
+    assert client.bundles == [["hash-a", "hash-b"]]
+    assert ids == [first.header.id, second.header.id]
+
+
+def test_flush_on_byte_limit():
+    client = FakeClient()
+    bundler = BundleAggregator(client, max_items=100, max_bytes=2048)
+
+    bundler.add(DataItem(data=b'\0' * 4096), "hash-a")
+    assert client.bundles == [["hash-a"]]
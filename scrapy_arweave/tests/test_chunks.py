@@ -0,0 +1,60 @@
+import pytest
+
+from ..chunks import HEADER, ChunkUploader
+
+
+class FakeTransaction:
+    id = "tx"
+    data = b"data"
+
+    def __init__(self, count):
+        self.chunks = {"chunks": list(range(count))}
+
+    def to_dict(self):
+        return {"id": self.id}
+
+    def get_chunk(self, index):
+        return {"offset": str(index)}
+
+
+class FakePeer:
+    def __init__(self, failures):
+        self.failures = failures
+        self.headers = []
+        self.chunks = []
+
+    def send_tx(self, json_data):
+        self.headers.append(json_data)
+
+    def send_chunk(self, json_data):
+        if self.failures.get(json_data["offset"], 0):
+            self.failures[json_data["offset"]] -= 1
+            raise ConnectionError(json_data["offset"])
+        self.chunks.append(json_data["offset"])
+
+
+def test_failed_chunks_are_retried(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda delay: None)
+    peer = FakePeer({"2": 1})
+    uploader = ChunkUploader(peer, concurrency=3)
+
+    assert uploader.upload(FakeTransaction(5), None) == "tx"
+    assert peer.headers == [{"id": "tx"}]
+    assert sorted(peer.chunks) == ["0", "1", "2", "3", "4"]
+
+
+def test_resume_skips_confirmed_chunks(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda delay: None)
+    peer = FakePeer({"3": 10})
+    uploader = ChunkUploader(peer, max_retries=1)
+
+    confirmed = set()
+    with pytest.raises(ConnectionError):
+        uploader.upload(FakeTransaction(4), None, confirmed)
+    assert confirmed == {HEADER, 0, 1, 2}
+
+    peer.failures = {}
+    peer.chunks = []
+    uploader.upload(FakeTransaction(4), None, confirmed)
+    assert peer.chunks == ["3"]
+    assert len(peer.headers) == 1
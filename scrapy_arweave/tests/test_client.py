@@ -0,0 +1,151 @@
+import json
+import sys
+from unittest.mock import Mock
+
+import pytest
+from ar import ArweaveNetworkException
+from ar.utils import b64enc
+from twisted.internet import threads
+from twisted.trial import unittest
+from twisted.web import resource, server
+
+from ..chunks import ChunkUploader
+from ..client import ArweaveStorageClient
+from ..gateways import GatewayPool
+from ..routing import UploadRouter
+from ..scheduler import UploadScheduler
+
+
+class FakeGateway(resource.Resource):
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.posts = []
+        self.statuses = {}
+
+    def render(self, request):
+        # Close every connection so the reactor is clean when the test ends.
+        request.channel.persistent = False
+        request.setHeader(b"connection", b"close")
+        return super().render(request)
+
+    def render_GET(self, request):
+        if request.path == b"/tx_anchor":
+            return b64enc(b"\0" * 48).encode()
+        if request.path.startswith(b"/price/"):
+            return b"1000"
+        request.setResponseCode(404)
+        return b"Not Found"
+
+    def render_POST(self, request):
+        path = request.path.decode()
+        self.posts.append((path, len(request.content.read())))
+        if self.statuses.get(path):
+            request.setResponseCode(self.statuses[path].pop(0))
+            return b"Failed"
+        if request.path == b"/tx/arweave":
+            return json.dumps({"id": "dataitem"}).encode()
+        return b"OK"
+
+
+class ClientTest(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _wallet(self, wallet_jwk):
+        self.wallet_jwk = wallet_jwk
+
+    def setUp(self):
+        from twisted.internet import reactor
+
+        self.gateway = FakeGateway()
+        self.port = reactor.listenTCP(0, server.Site(self.gateway), interface="127.0.0.1")
+        self.addCleanup(self.port.stopListening)
+        self.url = "http://127.0.0.1:%d" % self.port.getHost().port
+
+    def test_l1_upload_from_worker_thread(self):
+        client = ArweaveStorageClient(self.wallet_jwk, self.url, router=UploadRouter(max_bundler_size=0))
+        self.addCleanup(client.close)
+
+        def _uploaded(tx_id):
+            self.assertEqual(len(tx_id), 43)
+            self.assertEqual([path for path, _ in self.gateway.posts], ["/tx", "/chunk"])
+            self.assertNotIn("ar.utils.transaction_uploader", sys.modules)
+
+        dfd = threads.deferToThread(client.upload, "file.txt", b"content")
+        return dfd.addCallback(_uploaded)
+
+    def test_unavailable_gateway_is_retried_by_scheduler(self):
+        client = ArweaveStorageClient(self.wallet_jwk, self.url, router=UploadRouter(max_bundler_size=0))
+        self.addCleanup(client.close)
+        scheduler = UploadScheduler(retry_delay=0.01)
+        scheduler.metrics = Mock()
+        self.gateway.statuses = {"/tx": [503]}
+
+        def _uploaded(tx_id):
+            self.assertEqual(len(tx_id), 43)
+            self.assertEqual([path for path, _ in self.gateway.posts], ["/tx", "/tx", "/chunk"])
+            scheduler.metrics.inc.assert_any_call("arweave/upload/retries/l1", 1)
+
+        dfd = scheduler.submit("l1", threads.deferToThread, client.upload, "file.txt", b"content")
+        return dfd.addCallback(_uploaded)
+
+    def test_interrupted_l1_upload_is_resumed(self):
+        gateways = GatewayPool([self.url])
+        client = ArweaveStorageClient(
+            self.wallet_jwk,
+            self.url,
+            router=UploadRouter(max_bundler_size=0),
+            gateways=gateways,
+            chunk_uploader=ChunkUploader(None, max_retries=0, gateways=gateways),
+        )
+        self.addCleanup(client.close)
+        scheduler = UploadScheduler(retry_delay=0.01)
+        self.gateway.statuses = {"/chunk": [503]}
+
+        def _uploaded(tx_id):
+            self.assertEqual(len(tx_id), 43)
+            # The header is posted once, the retry only sends the chunk that failed.
+            self.assertEqual([path for path, _ in self.gateway.posts], ["/tx", "/chunk", "/chunk"])
+            self.assertEqual(client._interrupted, {})
+
+        dfd = scheduler.submit("l1", threads.deferToThread, client.upload, "file.txt", b"content", hash="hash")
+        return dfd.addCallback(_uploaded)
+
+    def test_bundler_outage_is_not_sent_to_l1(self):
+        client = ArweaveStorageClient(self.wallet_jwk, self.url, bundler_url=self.url)
+        self.addCleanup(client.close)
+        self.gateway.statuses = {"/tx/arweave": [503]}
+
+        def _failed(exc):
+            self.assertEqual(exc.args[1], 503)
+            self.assertEqual([path for path, _ in self.gateway.posts], ["/tx/arweave"])
+
+        dfd = threads.deferToThread(client.upload, "file.txt", b"content")
+        return self.assertFailure(dfd, ArweaveNetworkException).addCallback(_failed)
+
+    def test_rejected_dataitem_is_sent_to_l1(self):
+        client = ArweaveStorageClient(self.wallet_jwk, self.url, bundler_url=self.url)
+        self.addCleanup(client.close)
+        self.gateway.statuses = {"/tx/arweave": [402]}
+
+        def _uploaded(tx_id):
+            self.assertEqual(len(tx_id), 43)
+            self.assertEqual([path for path, _ in self.gateway.posts], ["/tx/arweave", "/tx", "/chunk"])
+
+        dfd = threads.deferToThread(client.upload, "file.txt", b"content")
+        return dfd.addCallback(_uploaded)
+
+    def test_throttled_dataitem_is_resent_whole(self):
+        client = ArweaveStorageClient(self.wallet_jwk, self.url, bundler_url=self.url)
+        self.addCleanup(client.close)
+        scheduler = UploadScheduler(retry_delay=0.01)
+        dataitem = client.create_dataitem("file.txt", b"content")
+        self.gateway.statuses = {"/tx/arweave": [429]}
+
+        def _sent(tx_id):
+            self.assertEqual(tx_id, "dataitem")
+            size = dataitem.get_len_bytes()
+            self.assertEqual(self.gateway.posts, [("/tx/arweave", size), ("/tx/arweave", size)])
+
+        dfd = scheduler.submit("bundler", client.deferred_send_dataitem, dataitem)
+        return dfd.addCallback(_sent)
@@ -0,0 +1,36 @@
+import gzip
+from tempfile import TemporaryFile
+
+from ..client import ArweaveStorageClient
+from ..compression import Compressor
+
+
+def test_compressor_matches_mime_types_and_sizes():
+    compressor = Compressor(min_size=100)
+    assert compressor.accepts("text/csv; charset=utf-8", 100)
+    assert compressor.accepts("application/json", 1000)
+    assert not compressor.accepts("application/json", 99)
+    assert not compressor.accepts("image/jpeg", 1000)
+    assert not compressor.accepts(None, 1000)
+
+    data = b'{"name": "value"}\n' * 1000
+    assert compressor.compress(data) == compressor.compress(data)
+    with TemporaryFile() as file:
+        file.write(data)
+        file.seek(0)
+        with compressor.compress_file(file) as compressed:
+            assert gzip.decompress(compressed.read()) == data
+
+
+def test_compressed_uploads_keep_original_hash(wallet_jwk):
+    client = ArweaveStorageClient(wallet_jwk, "http://localhost:1984", compressor=Compressor())
+    data = b"id,name\n" + b"1,value\n" * 1000
+    file_hash = client.calculate_buffer_hash(data)
+
+    payload, tags = client._prepare("items.csv", data, file_hash)
+    assert gzip.decompress(payload) == data
+    assert tags == [("Content-Type", "text/csv"), ("Content-Encoding", "gzip"), ("File-Hash", file_hash)]
+
+    payload, tags = client._prepare("items.csv", data[:100], file_hash)
+    assert payload == data[:100]
+    assert ("Content-Encoding", "gzip") not in tags
@@ -0,0 +1,80 @@
+from collections import Counter
+
+from twisted.internet import defer
+
+from ..confirmations import ConfirmationTracker
+from ..metrics import Metrics
+
+
+class FakeClient:
+    def __init__(self, indexed):
+        self.indexed = indexed
+        self.counts = Counter()
+        self.metrics = Metrics(hook=lambda kind, name, value: self.counts.update({name: value}))
+        self.queries = []
+        self.confirmed = []
+        self.forgotten = []
+
+    def deferred_get_confirmed_ids(self, ids):
+        self.queries.append(list(ids))
+        return defer.succeed({id for id in ids if id in self.indexed})
+
+    def confirm(self, hash, tx_id):
+        self.confirmed.append((hash, tx_id))
+
+    def forget(self, hash):
+        self.forgotten.append(hash)
+
+
+def test_confirmations_are_checked_in_batches():
+    client = FakeClient({"tx%d" % index for index in range(0, 250, 2)})
+    tracker = ConfirmationTracker(client, batch_size=100, grace=60)
+    for index in range(250):
+        tracker.track("tx%d" % index, "hash%d" % index)
+
+    results = []
+    tracker.check().addCallback(results.append)
+
+    assert results == [125]
+    assert [len(batch) for batch in client.queries] == [100, 100, 50]
+    assert ("hash0", "tx0") in client.confirmed
+    # Ids not indexed yet are kept until the grace period is over.
+    assert len(tracker) == 125
+    assert client.counts == {"arweave/confirm/confirmed": 125}
+
+
+def test_missing_uploads_are_requeued():
+    client = FakeClient(set())
+    reuploads = []
+
+    def reupload(hash, path):
+        reuploads.append((hash, path))
+        return "new_tx"
+
+    tracker = ConfirmationTracker(client, grace=0, max_retries=1, reupload=reupload)
+    tracker.track("tx", "hash", "/files/full/file.txt")
+    tracker.check()
+
+    assert client.forgotten == ["hash"]
+    assert reuploads == [("hash", "/files/full/file.txt")]
+    assert len(tracker) == 1
+
+    # The new upload is missing too, but the hash ran out of retries.
+    tracker.check()
+    assert len(reuploads) == 1
+    assert len(tracker) == 0
+    assert client.counts == {"arweave/confirm/missing": 2, "arweave/confirm/requeued": 1}
+
+
+def test_stop_checks_uploads_tracked_until_then():
+    client = FakeClient({"tx"})
+    tracker = ConfirmationTracker(client, grace=60)
+    tracker.start()
+    tracker.track("tx", "hash")
+
+    results = []
+    tracker.stop().addCallback(results.append)
+
+    assert results == [None]
+    assert client.confirmed == [("hash", "tx")]
+    assert len(tracker) == 0
@@ -0,0 +1,19 @@
+from tempfile import TemporaryFile
+
+import pytest
+
+from ..exporters import ParquetItemExporter
+
+
+def test_parquet_exporter_writes_row_groups():
+    pq = pytest.importorskip("pyarrow.parquet")
+    with TemporaryFile() as file:
+        exporter = ParquetItemExporter(file, row_group_size=2)
+        exporter.start_exporting()
+        for number in range(5):
+            exporter.export_item({"n": number, "name": "item%d" % number})
+        exporter.finish_exporting()
+
+        parquet = pq.ParquetFile(file)
+        assert parquet.metadata.num_row_groups == 3
+        assert parquet.read_row_group(1, columns=["name"]).to_pylist() == [{"name": "item2"}, {"name": "item3"}]
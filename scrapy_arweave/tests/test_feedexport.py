@@ -0,0 +1,127 @@
+import json
+from unittest.mock import Mock
+
+from scrapy.extensions.feedexport import ItemFilter
+from scrapy.settings import Settings
+from twisted.internet import defer
+
+from .. import feedexport
+from ..client import release_client
+from ..feedexport import ArweaveFeedStorage
+
+
+def test_rolling_feed_uploads_parts_and_manifest(monkeypatch, wallet_jwk):
+    settings = Settings({"WALLET_JWK": wallet_jwk, "ARWEAVE_FEED_PART_ITEMS": 2})
+    monkeypatch.setattr(feedexport, "get_project_settings", lambda: settings)
+    monkeypatch.setattr(feedexport.threads, "deferToThread", defer.maybeDeferred)
+    storage = ArweaveFeedStorage("ar://items.jsonl")
+    file = storage.open(spider=None)
+
+    uploads = []
+    manifests = []
+
+    def get_tx_id(hash):
+        raise KeyError(hash)
+
+    def upload_file(file, hash=None, compressor=None):
+        uploads.append(file.read())
+        return "part%d" % len(uploads)
+
+    def upload_manifest(paths, index=None):
+        manifests.append((paths, index))
+        return "manifest"
+
+    monkeypatch.setattr(storage.client, "get_tx_id", get_tx_id)
+    monkeypatch.setattr(storage.client, "upload_file", upload_file)
+    monkeypatch.setattr(storage.client, "upload_manifest", upload_manifest)
+
+    for number in range(5):
+        file.write(b'{"n": %d}\n' % number)
+        storage.item_scraped({}, spider=None)
+        if number == 1:
+            assert uploads == [b'{"n": 0}\n{"n": 1}\n']
+
+    results = []
+    storage.store(file).addCallback(results.append)
+
+    assert uploads == [b'{"n": 0}\n{"n": 1}\n', b'{"n": 2}\n{"n": 3}\n', b'{"n": 4}\n']
+    assert manifests == [
+        (
+            {"items-00000.jsonl": "part1", "items-00001.jsonl": "part2", "items-00002.jsonl": "part3"},
+            "items-00000.jsonl",
+        )
+    ]
+    assert file.closed
+    # The last part is uploaded as it is, no new part is left open after it.
+    assert file.part is None
+
+
+class BooksOnly(ItemFilter):
+    def accepts(self, item):
+        return "book" in item
+
+
+def test_rolling_feed_counts_only_exported_items(wallet_jwk):
+    settings = Settings({"WALLET_JWK": wallet_jwk, "ARWEAVE_FEED_PART_ITEMS": 2})
+    storage = ArweaveFeedStorage(
+        "ar://items.jsonl", feed_options={"format": "jsonlines", "item_filter": BooksOnly}, settings=settings
+    )
+    file = storage.open(spider=None)
+    storage._upload_part = Mock()
+
+    for item in [{"book": 1}, {"film": 1}, {"film": 2}]:
+        storage.item_scraped(item, spider=None)
+    assert not storage._upload_part.called
+    storage.item_scraped({"book": 2}, spider=None)
+    assert storage._upload_part.called
+    file.cut(last=True).close()
+    release_client(storage.client)
+
+
+def test_only_line_formats_are_rolled(wallet_jwk):
+    settings = Settings({"WALLET_JWK": wallet_jwk, "ARWEAVE_FEED_PART_ITEMS": 2})
+    assert ArweaveFeedStorage("ar://items.jl", feed_options={"format": "jl"}, settings=settings).rolling
+    assert not ArweaveFeedStorage("ar://items.json", feed_options={"format": "json"}, settings=settings).rolling
+    assert not ArweaveFeedStorage("ar://items.xml", feed_options={"format": "xml"}, settings=settings).rolling
+
+
+def test_indexed_feed_uploads_chunk_index_and_manifest(monkeypatch, wallet_jwk):
+    settings = Settings({"WALLET_JWK": wallet_jwk, "ARWEAVE_COMPRESSION": "gzip"})
+    monkeypatch.setattr(feedexport.threads, "deferToThread", defer.maybeDeferred)
+    storage = ArweaveFeedStorage(
+        "ar://items.jsonl", feed_options={"format": "jsonlines", "arweave_index_items": 2}, settings=settings
+    )
+    assert storage.compressor is None
+    file = storage.open(spider=Mock(crawler=Mock(settings=settings)))
+
+    uploads = {}
+    manifests = []
+
+    def upload_file(file, hash=None, compressor=None):
+        uploads["feed"] = file.read()
+        return "feed"
+
+    def upload(file_path, file_buffer, hash=None):
+        uploads[file_path] = json.loads(file_buffer)
+        return "index"
+
+    def upload_manifest(paths, index=None):
+        manifests.append((paths, index))
+        return "manifest"
+
+    monkeypatch.setattr(storage.client, "http", Mock())
+    monkeypatch.setattr(storage.client, "deferred_get_tx_id", lambda hash: defer.fail(KeyError(hash)))
+    monkeypatch.setattr(storage.client, "upload_file", upload_file)
+    monkeypatch.setattr(storage.client, "upload", upload)
+    monkeypatch.setattr(storage.client, "upload_manifest", upload_manifest)
+
+    for number in range(5):
+        file.write(b'{"n": %d}\n' % number)
+    storage.store(file)
+
+    index = uploads["items.jsonl.index.json"]
+    assert index["data"] == "feed" and index["items"] == 5
+    assert [(chunk["offset"], chunk["items"]) for chunk in index["chunks"]] == [(0, 2), (18, 2), (36, 1)]
+    chunk = index["chunks"][1]
+    assert uploads["feed"][chunk["offset"] : chunk["offset"] + chunk["length"]] == b'{"n": 2}\n{"n": 3}\n'
+    assert manifests == [({"items.jsonl": "feed", "items.jsonl.index.json": "index"}, "items.jsonl")]
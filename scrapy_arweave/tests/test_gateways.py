@@ -0,0 +1,74 @@
+import time
+
+import pytest
+from ar import ArweaveNetworkException
+
+from ..client import ArweaveStorageClient
+from ..gateways import GatewayPool
+
+
+def test_failover_skips_unhealthy_gateways():
+    pool = GatewayPool(["http://a.test", "http://b.test"], max_failures=1, cooldown=60)
+    calls = []
+
+    def graphql(peer):
+        calls.append(peer.api_url)
+        if peer.api_url == "http://a.test":
+            raise ArweaveNetworkException("Service Unavailable", 503)
+        return "answer"
+
+    assert pool.call(graphql) == "answer"
+    assert pool.call(graphql) == "answer"
+    assert calls == ["http://a.test", "http://b.test", "http://b.test"]
+    assert pool.primary.url == "http://b.test"
+
+    # A bad request is not the gateway's fault and is not sent to the others.
+    calls.clear()
+
+    def bad_request(peer):
+        calls.append(peer.api_url)
+        raise ArweaveNetworkException("Bad Request", 400)
+
+    with pytest.raises(ArweaveNetworkException):
+        pool.call(bad_request)
+    assert calls == ["http://b.test"]
+
+
+def test_fastest_gateway_is_preferred():
+    pool = GatewayPool(["http://a.test", "http://b.test"])
+    slow, fast = pool.gateways
+    pool.record_success(slow, 0.5)
+    pool.record_success(fast, 0.1)
+    assert pool.ordered() == [fast, slow]
+
+    # One slow answer moves the average only part of the way.
+    pool.record_success(fast, 0.6)
+    assert pool.ordered() == [fast, slow]
+    pool.record_success(fast, 2.0)
+    assert pool.ordered() == [slow, fast]
+
+
+def test_hedged_lookup_returns_first_answer():
+    pool = GatewayPool(["http://slow.test", "http://fast.test"], hedge_delay=0.05)
+
+    def graphql(peer):
+        if peer.api_url == "http://slow.test":
+            time.sleep(1)
+        return peer.api_url
+
+    start = time.perf_counter()
+    try:
+        assert pool.hedged(graphql) == "http://fast.test"
+    finally:
+        pool.close()
+    assert time.perf_counter() - start < 0.5
+
+
+def test_permalinks_use_configured_gateway(wallet_jwk):
+    pool = GatewayPool(["http://a.test", "http://b.test"])
+    slow, fast = pool.gateways
+    pool.record_success(slow, 0.5)
+    pool.record_success(fast, 0.1)
+    client = ArweaveStorageClient(wallet_jwk, "http://a.test", gateways=pool)
+    assert pool.primary is fast
+    assert client.get_url("tx-id") == "http://a.test/tx-id"
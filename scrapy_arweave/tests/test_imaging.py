@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from twisted.internet import defer
+
+from ..imaging import ImageProcessor
+from ..pipelines import ArweaveFilesStore, ImagesPipeline
+
+
+def test_processor_waits_for_memory():
+    processor = ImageProcessor(max_workers=1, max_memory=10)
+    jobs = []
+
+    def run(func, *args, **kwargs):
+        jobs.append(defer.Deferred())
+        return jobs[-1]
+
+    processor._run = run
+    try:
+        results = []
+        processor.submit(6, None).addCallback(results.append)
+        processor.submit(6, None).addCallback(results.append)
+        assert len(jobs) == 1 and processor.reserved == 6
+
+        jobs[0].callback("first")
+        assert len(jobs) == 2 and processor.reserved == 6
+
+        jobs[1].callback("second")
+        assert results == ["first", "second"]
+        assert processor.reserved == 0
+
+        # An image larger than the cap still runs once nothing else is reserved.
+        processor.submit(20, None)
+        assert len(jobs) == 3
+    finally:
+        processor.close()
+
+
+def test_thumbnails_from_jpeg_draft(monkeypatch, tmp_path, wallet_jwk):
+    monkeypatch.setattr(ArweaveFilesStore, "WALLET_JWK", wallet_jwk)
+    monkeypatch.setattr(ArweaveFilesStore, "GATEWAY_URL", "http://localhost:1984")
+    monkeypatch.setattr(ArweaveFilesStore, "SETTINGS", Settings())
+    pipeline = ImagesPipeline(
+        str(tmp_path), settings=Settings({"IMAGES_THUMBS": {"small": (50, 50), "big": (270, 270)}})
+    )
+
+    buf = BytesIO()
+    Image.new("RGB", (1600, 1200), (200, 10, 10)).save(buf, "JPEG")
+    request = Request("http://example.com/image.jpg")
+    response = Response(request.url, body=buf.getvalue(), request=request)
+    try:
+        images = list(pipeline.get_images(response, request, info=None))
+    finally:
+        pipeline.image_processor.close()
+
+    (path, image, full_buf), (_, small, _), (_, big, _) = images
+    assert path.startswith("full/")
+    assert image.size == (1600, 1200)
+    assert full_buf.getvalue() == response.body
+    # Resized from a quarter scale draft, so the rounding may differ by a pixel from a full decode.
+    assert small.size[0] == 50 and small.size[1] in (37, 38)
+    assert big.size[0] == 270 and big.size[1] in (202, 203)
+
+
+def test_image_paths_are_computed_on_calling_thread(monkeypatch, tmp_path, wallet_jwk):
+    monkeypatch.setattr(ArweaveFilesStore, "WALLET_JWK", wallet_jwk)
+    monkeypatch.setattr(ArweaveFilesStore, "GATEWAY_URL", "http://localhost:1984")
+    monkeypatch.setattr(ArweaveFilesStore, "SETTINGS", Settings())
+    path_threads = []
+
+    class PathsPipeline(ImagesPipeline):
+        def file_path(self, request, response=None, info=None, *, item=None):
+            path_threads.append(threading.current_thread())
+            return "full/%s.jpg" % item["name"]
+
+        def thumb_path(self, request, thumb_id, response=None, info=None, *, item=None):
+            path_threads.append(threading.current_thread())
+            return "thumbs/%s/%s.jpg" % (thumb_id, item["name"])
+
+    pipeline = PathsPipeline(str(tmp_path), settings=Settings({"IMAGES_THUMBS": {"small": (50, 50)}}))
+
+    def run(func, *args, **kwargs):
+        # Runs the conversion in another thread like the processor's executor, the result is handed back here.
+        with ThreadPoolExecutor(1) as executor:
+            return defer.succeed(executor.submit(func, *args, **kwargs).result())
+
+    persisted = []
+    monkeypatch.setattr(pipeline.image_processor, "_run", run)
+    monkeypatch.setattr(pipeline.store, "persist_file", lambda path, buf, info, **kwargs: persisted.append(path))
+
+    buf = BytesIO()
+    Image.new("RGB", (100, 100)).save(buf, "JPEG")
+    request = Request("http://example.com/image.jpg")
+    response = Response(request.url, body=buf.getvalue(), request=request)
+    try:
+        pipeline.image_downloaded(response, request, info=None, item={"name": "cat"})
+    finally:
+        pipeline.image_processor.close()
+
+    assert persisted == ["full/cat.jpg", "thumbs/small/cat.jpg"]
+    assert path_threads == [threading.current_thread()] * 2
@@ -0,0 +1,23 @@
+from .. import index as hash_index
+from ..index import HashIndex
+
+
+def test_index_roundtrip(tmp_path):
+    index = HashIndex(str(tmp_path / "index.db"))
+    assert index.get("hash") is None
+    index.set("hash", "tx_id")
+    assert index.get("hash") == "tx_id"
+    index.close()
+
+    index = HashIndex(str(tmp_path / "index.db"))
+    assert index.get("hash") == "tx_id"
+
+
+def test_index_ttl(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(hash_index.time, "time", lambda: now[0])
+    index = HashIndex(str(tmp_path / "index.db"), ttl=1)
+    index.set("hash", "tx_id")
+    assert index.get("hash") == "tx_id"
+    now[0] += 1.1
+    assert index.get("hash") is None
@@ -0,0 +1,51 @@
+from ..journal import CONFIRMED, PENDING, SIGNED, SUBMITTED, UploadJournal
+
+
+def test_journal_replays_states(tmp_path):
+    path = tmp_path / "journal" / "uploads.jsonl"
+    journal = UploadJournal(str(path))
+    journal.record("done", PENDING, path="/files/done.jpg")
+    journal.record("done", SIGNED, id="tx-done")
+    journal.record("done", SUBMITTED, id="tx-done")
+    journal.record("interrupted", PENDING, path="/files/interrupted.jpg")
+    journal.record("interrupted", SIGNED, id="tx-interrupted")
+    journal.record("found", CONFIRMED, id="tx-found")
+    journal.record("found", CONFIRMED, id="tx-found")
+    journal.close()
+    assert len(path.read_text().splitlines()) == 6
+
+    with open(path, "a") as f:
+        f.write('{"hash": "torn", "sta')
+
+    journal = UploadJournal(str(path))
+    assert journal.get("done") == "tx-done"
+    assert journal.get("found") == "tx-found"
+    assert journal.get("interrupted") is None
+    assert journal.get_path("/files/done.jpg") == ("done", "tx-done")
+    assert journal.get_path("/files/interrupted.jpg") is None
+    assert journal.pending() == [
+        {"hash": "interrupted", "state": SIGNED, "path": "/files/interrupted.jpg", "id": "tx-interrupted"}
+    ]
+
+    # Records written after the torn line survive the next replay.
+    journal.record("new", SUBMITTED, id="tx-new")
+    journal.close()
+    journal = UploadJournal(str(path))
+    assert journal.get("new") == "tx-new"
+    assert journal.get("done") == "tx-done"
+    assert len(path.read_text().splitlines()) == 7
+    journal.close()
+
+
+def test_journal_is_compacted_while_recording(tmp_path):
+    path = tmp_path / "uploads.jsonl"
+    journal = UploadJournal(str(path))
+    for number in range(1100):
+        journal.record("hash%d" % (number % 2), SIGNED if number % 4 < 2 else SUBMITTED, id="tx%d" % number)
+    assert len(path.read_text().splitlines()) < 100
+
+    journal.close()
+    journal = UploadJournal(str(path))
+    assert journal.get("hash1") == "tx1099"
+    assert journal.get("hash0") == "tx1098"
+    journal.close()
@@ -0,0 +1,27 @@
+from twisted.internet import defer
+
+from ..lookup import BatchedHashLookup
+
+
+class FakeClient:
+    def __init__(self, known):
+        self.known = known
+        self.calls = []
+
+    def deferred_get_tx_ids(self, hashes):
+        self.calls.append(sorted(hashes))
+        return defer.succeed({hash: self.known[hash] for hash in hashes if hash in self.known})
+
+
+def test_lookups_are_batched():
+    client = FakeClient({"a": "tx-a", "b": "tx-b"})
+    batched = BatchedHashLookup(client, max_size=3)
+
+    results = []
+    batched.lookup("a").addCallback(results.append)
+    batched.lookup("a").addCallback(results.append)
+    batched.lookup("b").addCallback(results.append)
+    batched.lookup("c").addErrback(lambda f: results.append(f.check(KeyError)))
+
+    assert client.calls == [["a", "b", "c"]]
+    assert results == ["tx-a", "tx-a", "tx-b", KeyError]
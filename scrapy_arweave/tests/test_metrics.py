@@ -0,0 +1,47 @@
+import pytest
+from scrapy.utils.test import get_crawler
+
+from ..client import ArweaveStorageClient
+from ..metrics import Metrics
+
+
+def test_timed_records_latency_errors_and_hook():
+    stats = get_crawler().stats
+    exported = []
+    metrics = Metrics(stats, hook=lambda kind, name, value: exported.append((kind, name)))
+
+    with metrics.timed("sign"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timed("sign"):
+            raise ValueError("bad key")
+    metrics.add_bytes("bundler", 512)
+
+    assert stats.get_value("arweave/sign/count") == 1
+    assert stats.get_value("arweave/sign/latency/le_0.01s") == 1
+    assert stats.get_value("arweave/sign/errors/ValueError") == 1
+    assert stats.get_value("arweave/bundler/bytes") == 512
+    assert exported == [
+        ("timing", "sign"),
+        ("count", "arweave/sign/errors/ValueError"),
+        ("count", "arweave/bundler/bytes"),
+    ]
+
+
+def test_lookups_count_dedup_hits(monkeypatch, wallet_jwk):
+    client = ArweaveStorageClient(wallet_jwk, "http://localhost:1984")
+    client.stats = get_crawler().stats
+    response = {
+        "data": {
+            "transactions": {
+                "pageInfo": {"hasNextPage": False},
+                "edges": [{"cursor": "1", "node": {"id": "tx", "tags": [{"name": "File-Hash", "value": "a"}]}}],
+            }
+        }
+    }
+    monkeypatch.setattr(client.peer, "graphql", lambda query: response)
+
+    assert client.get_tx_ids(["a", "b"]) == {"a": "tx"}
+    assert client.stats.get_value("arweave/dedup/hit") == 1
+    assert client.stats.get_value("arweave/dedup/miss") == 1
+    assert client.stats.get_value("arweave/lookup/count") == 1
@@ -0,0 +1,105 @@
+import time
+from io import BytesIO
+from unittest.mock import Mock
+
+import pytest
+from scrapy.settings import Settings
+from twisted.internet import defer
+
+from .. import client, pipelines
+from ..index import HashIndex
+from ..pipelines import ArweaveFilesStore
+
+
+@pytest.fixture(autouse=True)
+def _release_clients():
+    # Stores take their client from the registry of the process, close them so no later test reuses one.
+    yield
+    for shared, _ in list(client._clients.values()):
+        shared.close()
+    client._clients.clear()
+
+
+def make_store(monkeypatch, tmp_path, wallet_jwk, **settings):
+    monkeypatch.setattr(pipelines.threads, "deferToThread", defer.maybeDeferred)
+    monkeypatch.setattr(ArweaveFilesStore, "WALLET_JWK", wallet_jwk)
+    monkeypatch.setattr(ArweaveFilesStore, "GATEWAY_URL", "http://localhost:1984")
+    monkeypatch.setattr(ArweaveFilesStore, "SETTINGS", Settings({"ARWEAVE_LOOKUP_BATCH_SIZE": 0, **settings}))
+    return ArweaveFilesStore(str(tmp_path / "files"))
+
+
+def test_diskless_persist_file(monkeypatch, tmp_path, wallet_jwk):
+    store = make_store(monkeypatch, tmp_path, wallet_jwk, ARWEAVE_FILES_DISKLESS=True)
+    uploads = []
+
+    def upload(file_path, file_buffer, hash=None):
+        uploads.append((file_buffer, hash))
+        return "tx_id"
+
+    monkeypatch.setattr(store.client, "get_tx_ids", lambda hashes: {})
+    monkeypatch.setattr(store.client, "upload", upload)
+
+    results = []
+    store.persist_file("full/file.txt", BytesIO(b"content"), info=None).addCallback(results.append)
+
+    assert results == ["tx_id"]
+    assert uploads == [(b"content", store.client.calculate_buffer_hash(b"content"))]
+    assert not (tmp_path / "files" / "full").exists()
+    assert store.stat_file("full/file.txt", info=None) == {}
+
+
+def test_diskless_skips_uploaded_file(monkeypatch, tmp_path, wallet_jwk):
+    store = make_store(monkeypatch, tmp_path, wallet_jwk, ARWEAVE_FILES_DISKLESS=True)
+    monkeypatch.setattr(store.client, "get_tx_ids", lambda hashes: {hash: "existing" for hash in hashes})
+    monkeypatch.setattr(store.client, "upload", None)
+
+    results = []
+    store.persist_file("full/file.txt", BytesIO(b"content"), info=None).addCallback(results.append)
+    assert results == ["existing"]
+
+
+def test_optimistic_persist_file_returns_signed_id(monkeypatch, tmp_path, wallet_jwk):
+    store = make_store(monkeypatch, tmp_path, wallet_jwk, ARWEAVE_FILES_DISKLESS=True, ARWEAVE_OPTIMISTIC=True)
+    submission = defer.Deferred()
+    sent_signals = []
+    monkeypatch.setattr(store.client, "get_tx_ids", lambda hashes: {})
+    monkeypatch.setattr(store.client, "deferred_send_dataitem", lambda dataitem: submission)
+    monkeypatch.setattr(store, "signals", Mock(send_catch_log=lambda signal, **kwargs: sent_signals.append(kwargs)))
+
+    results = []
+    store.persist_file("full/file.txt", BytesIO(b"content"), info=None).addCallback(results.append)
+
+    assert len(results) == 1
+    assert store.background and not sent_signals
+
+    submission.callback(results[0])
+    file_hash = store.client.calculate_buffer_hash(b"content")
+    assert sent_signals == [{"hash": file_hash, "tx_id": results[0]}]
+    assert not store.background
+
+
+def test_index_skips_stored_path_before_download(monkeypatch, tmp_path, wallet_jwk):
+    store = make_store(monkeypatch, tmp_path, wallet_jwk, ARWEAVE_FILES_DISKLESS=True)
+    monkeypatch.setattr(store.client, "index", HashIndex(str(tmp_path / "index.db")))
+    monkeypatch.setattr(store.client, "get_tx_ids", lambda hashes: {})
+    monkeypatch.setattr(store.client, "upload", lambda file_path, file_buffer, hash=None: "tx_id")
+
+    assert store.stat_file("full/file.txt", info=None) == {}
+    store.persist_file("full/file.txt", BytesIO(b"content"), info=None)
+    stat = store.stat_file("full/file.txt", info=None)
+    assert stat["tx_id"] == "tx_id"
+    assert stat["last_modified"] <= time.time()
+
+
+def test_failed_optimistic_upload_is_forgotten(monkeypatch, tmp_path, wallet_jwk):
+    store = make_store(monkeypatch, tmp_path, wallet_jwk, ARWEAVE_FILES_DISKLESS=True, ARWEAVE_OPTIMISTIC=True)
+    submission = defer.Deferred()
+    monkeypatch.setattr(store.client, "index", HashIndex(str(tmp_path / "index.db")))
+    monkeypatch.setattr(store.client, "get_tx_ids", lambda hashes: {})
+    monkeypatch.setattr(store.client, "deferred_send_dataitem", lambda dataitem: submission)
+
+    store.persist_file("full/file.txt", BytesIO(b"content"), info=None)
+    assert store.stat_file("full/file.txt", info=None)["tx_id"]
+
+    submission.errback(ValueError("rejected"))
+    assert store.stat_file("full/file.txt", info=None) == {}
@@ -0,0 +1,34 @@
+import requests
+from ar import ArweaveNetworkException
+
+from ..routing import BUNDLER, L1, UploadRouter
+
+
+def test_route_by_size():
+    router = UploadRouter(max_bundler_size=100)
+    assert router.choose(100) == BUNDLER
+    assert router.choose(101) == L1
+
+
+def test_unhealthy_bundler_is_skipped():
+    router = UploadRouter(max_failures=2, cooldown=60)
+    router.record_failure()
+    assert router.choose(1) == BUNDLER
+    router.record_failure()
+    assert router.choose(1) == L1
+
+    router.unhealthy_until = 0
+    assert router.choose(1) == BUNDLER
+
+
+def test_only_rejections_and_outages_fall_back():
+    router = UploadRouter(max_failures=2)
+    assert not router.falls_back(ArweaveNetworkException("Too Many Requests", 429))
+    assert not router.falls_back(ArweaveNetworkException("Service Unavailable", 503))
+    assert not router.falls_back(requests.ConnectionError())
+    assert router.falls_back(ArweaveNetworkException("Payment Required", 402))
+    assert router.falls_back(ArweaveNetworkException("Bad Request", 400))
+
+    router.record_failure()
+    router.record_failure()
+    assert router.falls_back(ArweaveNetworkException("Service Unavailable", 503))
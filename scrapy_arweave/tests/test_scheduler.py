@@ -0,0 +1,105 @@
+from ar import ArweaveNetworkException
+from twisted.internet import defer
+
+from .. import scheduler as scheduler_module
+from ..scheduler import UploadScheduler
+
+
+def no_delay(monkeypatch):
+    delays = []
+
+    def defer_later(clock, delay, callable):
+        delays.append(delay)
+        return defer.maybeDeferred(callable)
+
+    monkeypatch.setattr(scheduler_module.task, "deferLater", defer_later)
+    return delays
+
+
+def test_retries_throttled_uploads_with_backoff(monkeypatch):
+    delays = no_delay(monkeypatch)
+    scheduler = UploadScheduler(max_retries=3, retry_delay=1.0)
+    responses = [ArweaveNetworkException("slow down", 429), ArweaveNetworkException("unavailable", 503), "tx_id"]
+
+    def upload():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            return defer.fail(response)
+        return defer.succeed(response)
+
+    results = []
+    scheduler.submit("bundler", upload).addCallback(results.append)
+
+    assert results == ["tx_id"]
+    assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
+    assert scheduler.pending == 0
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    no_delay(monkeypatch)
+    scheduler = UploadScheduler(max_retries=3)
+    calls = []
+
+    def upload():
+        calls.append(1)
+        raise ArweaveNetworkException("bad request", 400)
+
+    failures = []
+    scheduler.submit("l1", upload).addErrback(failures.append)
+
+    assert len(calls) == 1
+    assert failures[0].check(ArweaveNetworkException)
+
+
+def test_endpoint_concurrency_and_backpressure():
+    scheduler = UploadScheduler(max_queue=2, concurrency={"l1": 1})
+    uploads = [defer.Deferred(), defer.Deferred()]
+    started = []
+
+    def upload(index):
+        started.append(index)
+        return uploads[index]
+
+    scheduler.submit("l1", upload, 0)
+    scheduler.submit("l1", upload, 1)
+    assert started == [0]
+
+    room = []
+    scheduler.wait_for_room().addCallback(room.append)
+    assert room == []
+
+    uploads[0].callback("first")
+    assert started == [0, 1]
+    assert room == [None]
+
+
+def test_waiters_hold_their_place_until_done():
+    scheduler = UploadScheduler(max_queue=2)
+    uploads = [defer.Deferred(), defer.Deferred()]
+    for upload in uploads:
+        scheduler.submit("bundler", lambda upload=upload: upload)
+
+    items = [defer.Deferred() for _ in range(5)]
+    started = []
+
+    def process(index):
+        started.append(index)
+        return items[index]
+
+    for index in range(5):
+        scheduler.run_when_room(process, index)
+    assert started == []
+
+    # One free place lets one item through, which holds it until its uploads are submitted.
+    uploads[0].callback("tx")
+    assert started == [0]
+    scheduler.submit("bundler", lambda: defer.Deferred())
+    items[0].callback(None)
+    assert started == [0]
+    assert scheduler.pending == 2 and scheduler.reserved == 0
+
+    # An item that submits nothing gives its place to the next one.
+    uploads[1].callback("tx")
+    assert started == [0, 1]
+    items[1].callback(None)
+    assert started == [0, 1, 2]
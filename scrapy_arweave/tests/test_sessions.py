@@ -0,0 +1,28 @@
+from scrapy.settings import Settings
+
+from .. import client as client_module
+from ..client import get_client, release_client
+from ..sessions import get_session
+
+
+def test_clients_are_shared_per_wallet_and_gateway(monkeypatch, wallet_jwk):
+    settings = Settings({"WALLET_JWK": wallet_jwk, "ARWEAVE_HTTP_POOL_SIZE": 8})
+    first = get_client(settings)
+    second = get_client(settings)
+    other = get_client(settings, gateway_url="http://gateway.test")
+
+    assert first is second
+    assert other is not first
+    session = get_session(pool_size=8)
+    assert first.session is session
+    assert first.node.session is first.peer.session is first.wallet.peer.session is session
+    assert first.chunk_uploader.peer.session is session
+
+    closed = []
+    monkeypatch.setattr(first, "close", lambda: closed.append(first))
+    release_client(second)
+    assert not closed
+    release_client(first)
+    assert closed == [first]
+    release_client(other)
+    assert other not in [entry[0] for entry in client_module._clients.values()]
@@ -0,0 +1,16 @@
+import json
+
+from ..signing import SigningPool
+
+
+def test_signing_pool(wallet_jwk):
+    with open(wallet_jwk) as f:
+        pool = SigningPool(json.load(f), max_workers=2)
+    try:
+        dataitem = pool.sign(b"content", [("Content-Type", "text/plain")])
+    finally:
+        pool.close()
+
+    assert dataitem.data == b"content"
+    assert dataitem.header.tags == [{"name": b"Content-Type", "value": b"text/plain"}]
+    assert dataitem.verify()
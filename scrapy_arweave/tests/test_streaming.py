@@ -0,0 +1,41 @@
+import json
+import os
+
+from ar import Bundle, DataItem, Wallet
+
+from ..signing import sign_dataitem
+from ..streaming import DataItemReader, serialize_bundle, sign_dataitem_header
+
+
+def test_streamed_dataitem(tmp_path, wallet_jwk):
+    with open(wallet_jwk) as f:
+        wallet = Wallet.from_data(json.load(f))
+    data = os.urandom(300 * 1024)
+    path = tmp_path / "feed.jsonl"
+    path.write_bytes(data)
+
+    with open(path, "rb") as file:
+        header = sign_dataitem_header(wallet.rsa, file, len(data), [("Content-Type", "application/json")], 4096)
+        reader = DataItemReader(header.tobytes(), file, len(data))
+        assert len(reader) == len(header.tobytes()) + len(data)
+        serialized = reader.read()
+
+    dataitem = DataItem.frombytes(serialized)
+    assert dataitem.data == data
+    assert dataitem.header.id == header.id
+    assert dataitem.verify()
+
+
+def test_buffers_serialize_without_joining(wallet_jwk):
+    with open(wallet_jwk) as f:
+        wallet = Wallet.from_data(json.load(f))
+    body = os.urandom(64 * 1024)
+    dataitems = [
+        sign_dataitem(wallet.rsa, memoryview(body)[:1000], [("Content-Type", "text/plain")]),
+        sign_dataitem(wallet.rsa, body, []),
+    ]
+
+    reader = DataItemReader.from_dataitem(dataitems[0])
+    reader.seek(100)
+    assert reader.read() == DataItem(dataitems[0].header, bytes(body[:1000])).tobytes()[100:]
+    assert serialize_bundle(dataitems) == Bundle(dataitems).tobytes()
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from ar import ArweaveNetworkException
+from scrapy.settings import Settings
+from twisted.internet import defer, reactor, task
+from twisted.trial import unittest
+from twisted.web import resource, server
+
+from ..client import HASH_LOOKUP_QUERY, ArweaveStorageClient
+from ..twisted_client import TwistedHTTPClient
+
+
+class FakeGateway(resource.Resource):
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.held = []
+        self.running = 0
+        self.max_running = 0
+
+    def render_POST(self, request):
+        # Close every connection so the reactor is clean when the test ends.
+        request.channel.persistent = False
+        request.setHeader(b"connection", b"close")
+        body = request.content.read()
+        self.requests.append((request.path.decode(), request.getHeader("content-type"), body))
+        if request.path == b"/error":
+            request.setResponseCode(503)
+            return b"Service Unavailable"
+        if request.path == b"/held":
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.held.append(request)
+            return server.NOT_DONE_YET
+        if request.path == b"/graphql":
+            edges = [{"cursor": "1", "node": {"id": "tx-a", "tags": [{"name": "File-Hash", "value": "a"}]}}]
+            data = {"data": {"transactions": {"pageInfo": {"hasNextPage": False}, "edges": edges}}}
+            return json.dumps(data).encode()
+        return json.dumps({"id": "dataitem"}).encode()
+
+    def release(self):
+        request = self.held.pop(0)
+        self.running -= 1
+        request.write(b"{}")
+        request.finish()
+
+
+class TwistedHTTPClientTest(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _wallet(self, wallet_jwk):
+        self.wallet_jwk = wallet_jwk
+
+    def setUp(self):
+        self.gateway = FakeGateway()
+        self.port = reactor.listenTCP(0, server.Site(self.gateway), interface="127.0.0.1")
+        self.addCleanup(self.port.stopListening)
+        self.url = "http://127.0.0.1:%d" % self.port.getHost().port
+
+    def make_http(self, concurrency=64):
+        http = TwistedHTTPClient(concurrency=concurrency, timeout=10)
+        self.addCleanup(http.close)
+        return http
+
+    def test_error_status_raises_network_exception(self):
+        dfd = self.make_http().post_bytes(self.url + "/error", b"data")
+        dfd = self.assertFailure(dfd, ArweaveNetworkException)
+        return dfd.addCallback(lambda exc: self.assertEqual(exc.args, ("Service Unavailable", 503)))
+
+    @defer.inlineCallbacks
+    def test_requests_in_flight_are_limited(self):
+        http = self.make_http(concurrency=2)
+        dfds = [http.post_json(self.url + "/held", {}) for _ in range(4)]
+        yield self.wait_for_held(2)
+        yield task.deferLater(reactor, 0.05, lambda: None)
+        self.assertEqual(len(self.gateway.requests), 2)
+
+        for _ in range(4):
+            yield self.wait_for_held(1)
+            self.gateway.release()
+        results = yield defer.gatherResults(dfds)
+        self.assertEqual(results, [{}] * 4)
+        self.assertEqual(self.gateway.max_running, 2)
+
+    @defer.inlineCallbacks
+    def wait_for_held(self, count):
+        while len(self.gateway.held) < count:
+            yield task.deferLater(reactor, 0.01, lambda: None)
+
+    def test_client_uses_reactor_backend(self):
+        settings = Settings(
+            {
+                "WALLET_JWK": self.wallet_jwk,
+                "GATEWAY_URL": self.url,
+                "ARWEAVE_BUNDLER_URL": self.url,
+                "ARWEAVE_HTTP_BACKEND": "twisted",
+            }
+        )
+        client = ArweaveStorageClient.from_settings(settings)
+        self.addCleanup(client.close)
+        self.assertIsInstance(client.http, TwistedHTTPClient)
+        dataitem = client.create_dataitem("file.txt", b"content")
+
+        def _found(found):
+            self.assertEqual(found, {"a": "tx-a"})
+            path, content_type, body = self.gateway.requests[0]
+            self.assertEqual((path, content_type), ("/graphql", "application/json"))
+            query = json.loads(body)["query"]
+            self.assertEqual(query, HASH_LOOKUP_QUERY % ('"a", "b"', ""))
+            return client.deferred_send_dataitem(dataitem)
+
+        def _sent(tx_id):
+            self.assertEqual(tx_id, "dataitem")
+            path, content_type, body = self.gateway.requests[1]
+            self.assertEqual((path, content_type), ("/tx/arweave", "application/octet-stream"))
+            self.assertEqual(body, dataitem.tobytes())
+
+        dfd = client.deferred_get_tx_ids(["a", "b"])
+        return dfd.addCallback(_found).addCallback(_sent)
@@ -0,0 +1,78 @@
+import threading
+from unittest.mock import patch
+
+from ..client import ArweaveStorageClient
+from ..wallets import LEAST_LOADED, WalletPool
+
+
+def make_jwks(count):
+    return [{"n": "key%d" % index} for index in range(count)]
+
+
+def test_round_robin_skips_spent_wallets_for_l1():
+    pool = WalletPool(make_jwks(3))
+    assert [pool.acquire().index for _ in range(4)] == [0, 1, 2, 0]
+
+    pool.shards[1].balance = 100
+    pool.record_spent(pool.shards[1], 100)
+    assert [pool.acquire(funded=True).index for _ in range(3)] == [2, 0, 2]
+    # Bundler uploads are not paid from the wallet balance.
+    assert pool.acquire().index == 0
+
+
+def test_least_loaded_prefers_idle_wallet():
+    pool = WalletPool(make_jwks(2), strategy=LEAST_LOADED)
+    busy = pool.acquire(1000)
+    idle = pool.acquire(10)
+    assert busy is not idle
+    pool.release(idle)
+    assert pool.acquire(10) is idle
+    pool.release(busy)
+    with pool.using(10) as shard:
+        assert shard is busy
+        assert shard.active == 1
+    assert shard.active == 0
+
+
+def test_client_shards_signing_across_wallets(wallet_jwk):
+    client = ArweaveStorageClient([wallet_jwk, wallet_jwk], "http://localhost:1984")
+    assert len(client.wallets) == 2
+    # The keys are parsed when they first sign, not when the client is created.
+    assert all(shard._wallet is None for shard in client.wallets)
+    assert client.wallets.primary.address == client.wallet.address
+
+    for _ in range(4):
+        assert client.create_dataitem("file.txt", b"content").verify()
+    assert [shard.uploads for shard in client.wallets] == [2, 2]
+    assert [shard.active for shard in client.wallets] == [0, 0]
+
+
+def test_signing_pool_leaves_keys_unparsed(wallet_jwk):
+    client = ArweaveStorageClient([wallet_jwk, wallet_jwk], "http://localhost:1984", signing_pool_size=1)
+    try:
+        # The worker processes parse the keys, the client does not.
+        assert all(shard._wallet is None for shard in client.wallets)
+    finally:
+        client.close()
+
+
+def test_max_concurrency_holds_per_wallet():
+    pool = WalletPool(make_jwks(2), max_concurrency=1)
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+
+    waiting = pool.deferred_acquire(10)
+    assert not waiting.called
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pool.acquire()))
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()
+
+    with patch("twisted.internet.reactor.callFromThread", lambda func, *args: func(*args)):
+        pool.release(second)
+        pool.release(first)
+    thread.join(1)
+    assert waiting.result is second and results == [first]
+    assert [shard.active for shard in pool] == [1, 1]
+    assert second.bytes == 10
@@ -0,0 +1,69 @@
+import json
+from io import BytesIO
+
+from twisted.internet import defer
+from twisted.web.client import Agent, FileBodyProducer, HTTPConnectionPool, readBody
+from twisted.web.http_headers import Headers
+
+
+class TwistedHTTPClient:
+    """
+    Non-blocking HTTP client running on the Twisted reactor.
+    At most `concurrency` requests are in flight at once and connections are kept alive in a shared pool.
+    """
+
+    def __init__(self, concurrency=64, timeout=60):
+        from twisted.internet import reactor
+
+        self.timeout = timeout
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.pool.maxPersistentPerHost = concurrency
+        self.agent = Agent(reactor, connectTimeout=timeout, pool=self.pool)
+        self.semaphore = defer.DeferredSemaphore(concurrency)
+
+    @classmethod
+    def from_settings(cls, settings):
+        if settings.get('ARWEAVE_HTTP_BACKEND', 'threads') != 'twisted':
+            return None
+        return cls(
+            concurrency=settings.getint('ARWEAVE_HTTP_CONCURRENCY', 64),
+            timeout=settings.getfloat('ARWEAVE_HTTP_TIMEOUT', 60),
+        )
+
+    def request(self, method, url, body=None, headers=None):
+        """Return a Deferred that fires with the response body, or fails with ArweaveNetworkException."""
+        return self.semaphore.run(self._request, method, url, body, headers or {})
+
+    def post_json(self, url, data):
+        body = json.dumps(data).encode()
+        dfd = self.request('POST', url, body, {'Content-Type': 'application/json'})
+        return dfd.addCallback(json.loads)
+
+    def post_bytes(self, url, data):
+        dfd = self.request('POST', url, data, {'Content-Type': 'application/octet-stream'})
+        return dfd.addCallback(json.loads)
+
+    def close(self):
+        return self.pool.closeCachedConnections()
+
+    def _request(self, method, url, body, headers):
+        from twisted.internet import reactor
+
+        if body is not None and not hasattr(body, 'read'):
+            body = BytesIO(body)
+        producer = FileBodyProducer(body) if body is not None else None
+        headers = Headers({name.encode(): [value.encode()] for name, value in headers.items()})
+        dfd = self.agent.request(method.encode(), url.encode(), headers, producer)
+        dfd.addCallback(self._read_response)
+        dfd.addTimeout(self.timeout, reactor)
+        return dfd
+
+    def _read_response(self, response):
+        def _check_status(body):
+            if not 200 <= response.code < 300:
+                from ar import ArweaveNetworkException
+
+                raise ArweaveNetworkException(body.decode(errors='replace'), response.code)
+            return body
+
+        return readBody(response).addCallback(_check_status)
@@ -0,0 +1,207 @@
+import base64
+import contextlib
+import hashlib
+import itertools
+import logging
+import threading
+
+from twisted.internet import defer
+
+ROUND_ROBIN = 'round-robin'
+LEAST_LOADED = 'least-loaded'
+
+logger = logging.getLogger(__name__)
+
+
+def _b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def jwk_address(jwk_data):
+    """The wallet address of a JWK, computed without parsing the RSA key."""
+    digest = hashlib.sha256(_b64url_decode(jwk_data['n'])).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def _load_wallet(jwk_data):
+    from ar import Wallet
+
+    return Wallet.from_data(jwk_data)
+
+
+class WalletShard:
+    def __init__(self, jwk_data, index, load=_load_wallet):
+        self.jwk_data = jwk_data
+        self.index = index
+        self.address = jwk_address(jwk_data)
+        self._load = load
+        self._wallet = None
+        self._lock = threading.Lock()
+        self.active = 0
+        self.uploads = 0
+        self.bytes = 0
+        self.spent = 0
+        self.balance = None
+
+    @property
+    def wallet(self):
+        """The pyarweave Wallet, its RSA key is only parsed when something is first signed with it."""
+        if self._wallet is None:
+            with self._lock:
+                if self._wallet is None:
+                    self._wallet = self._load(self.jwk_data)
+        return self._wallet
+
+    @property
+    def remaining(self):
+        """Winston left for L1 transactions, None until refresh_balances has run."""
+        if self.balance is None:
+            return None
+        return self.balance - self.spent
+
+    def __repr__(self):
+        return 'WalletShard(%r)' % self.address
+
+
+class WalletPool:
+    """
+    Spreads signing and submission over several wallets, so no single key or bundler account
+    serializes the uploads. Wallets are taken in turn (round-robin) or the one with the fewest uploads
+    in flight first (least-loaded). L1 transactions skip wallets whose known balance is spent.
+    With max_concurrency, wallets with that many uploads in flight are skipped, and uploads wait for
+    a wallet to be released once all of them are.
+    jwks lists the JWK data of the wallets, load(jwk_data) returns a Wallet the first time one is used.
+    """
+
+    metrics = None
+
+    def __init__(self, jwks, strategy=ROUND_ROBIN, load=_load_wallet, max_concurrency=0):
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(
+                'Unknown ARWEAVE_WALLET_STRATEGY %r, use %s or %s' % (strategy, ROUND_ROBIN, LEAST_LOADED)
+            )
+        self.shards = [WalletShard(jwk_data, index, load) for index, jwk_data in enumerate(jwks)]
+        self.strategy = strategy
+        self.max_concurrency = max_concurrency
+        self._turns = itertools.cycle(self.shards)
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._waiters = []
+
+    def __iter__(self):
+        return iter(self.shards)
+
+    def __len__(self):
+        return len(self.shards)
+
+    @property
+    def primary(self):
+        return self.shards[0]
+
+    def acquire(self, size=0, funded=False):
+        """
+        Choose the wallet for one upload of size bytes and count it as in flight until release.
+        With funded, wallets whose known balance is spent are only used when every wallet is.
+        Blocks while every wallet has max_concurrency uploads in flight.
+        """
+        with self._lock:
+            shard = self._choose(funded)
+            while shard is None:
+                self._released.wait()
+                shard = self._choose(funded)
+            self._take(shard, size)
+        self._count_upload(shard, size)
+        return shard
+
+    def deferred_acquire(self, size=0):
+        """Like acquire, for the reactor thread: returns a Deferred that fires with the wallet once one is free."""
+        with self._lock:
+            shard = self._choose()
+            if shard is None:
+                dfd = defer.Deferred()
+                self._waiters.append((dfd, size))
+                return dfd
+            self._take(shard, size)
+        self._count_upload(shard, size)
+        return defer.succeed(shard)
+
+    def _choose(self, funded=False):
+        shards = self.shards
+        if funded:
+            shards = [shard for shard in shards if shard.remaining is None or shard.remaining > 0] or shards
+        if self.max_concurrency:
+            shards = [shard for shard in shards if shard.active < self.max_concurrency]
+            if not shards:
+                return None
+        if len(shards) == 1:
+            return shards[0]
+        if self.strategy == LEAST_LOADED:
+            return min(shards, key=lambda shard: (shard.active, shard.bytes))
+        return next(shard for shard in self._turns if shard in shards)
+
+    def _take(self, shard, size):
+        shard.active += 1
+        shard.uploads += 1
+        shard.bytes += size
+
+    def _count_upload(self, shard, size):
+        self._inc_stats('arweave/wallet/%s/uploads' % shard.address)
+        self._inc_stats('arweave/wallet/%s/bytes' % shard.address, size)
+
+    def release(self, shard):
+        waiter = None
+        with self._lock:
+            shard.active -= 1
+            # Uploads waiting on the reactor get the wallet first, blocked threads are woken for what is left.
+            if self._waiters:
+                waiter, size = self._waiters.pop(0)
+                self._take(shard, size)
+            else:
+                self._released.notify()
+        if waiter is not None:
+            from twisted.internet import reactor
+
+            self._count_upload(shard, size)
+            reactor.callFromThread(waiter.callback, shard)
+
+    @contextlib.contextmanager
+    def using(self, size=0, funded=False):
+        shard = self.acquire(size, funded)
+        try:
+            yield shard
+        finally:
+            self.release(shard)
+
+    def deferred_using(self, size, func):
+        """Return func(shard), a Deferred, holding the wallet until it fires."""
+
+        def _call(shard):
+            return defer.maybeDeferred(func, shard).addBoth(_release, shard)
+
+        def _release(result, shard):
+            self.release(shard)
+            return result
+
+        return self.deferred_acquire(size).addCallback(_call)
+
+    def record_spent(self, shard, winston):
+        with self._lock:
+            shard.spent += winston
+        self._inc_stats('arweave/wallet/%s/spent' % shard.address, winston)
+
+    def refresh_balances(self):
+        """Fetch the balance of every wallet from its gateway, returns address -> winston."""
+        balances = {}
+        for shard in self.shards:
+            balance = int(shard.wallet.peer.wallet_balance(shard.address))
+            with self._lock:
+                shard.balance = balance
+                shard.spent = 0
+            balances[shard.address] = balance
+            if not balance:
+                logger.warning('Wallet %s has no balance for L1 transactions', shard.address)
+        return balances
+
+    def _inc_stats(self, key, count=1):
+        if self.metrics is not None:
+            self.metrics.inc(key, count)
@@ -57,7 +57,8 @@ REQUIRED = [
 ]
 
 EXTRAS = {
-    # 'fancy feature': ['django'],
+    'zstd': ['zstandard'],
+    'parquet': ['pyarrow'],
 }
 
 here = os.path.abspath(os.path.dirname(__file__))